@@ -0,0 +1,86 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ...models import Account
+from ...serializers import MiniAccountSerializer
+from ....typeahead import AccountTypeahead, TYPEAHEAD_LIMIT, hydrate, normalize
+
+SYLLABLES = ('an', 'be', 'chi', 'da', 'el', 'fa', 'go', 'ha', 'is', 'jo', 'ka', 'li', 'mo', 'na', 'or', 'pe', 'qui', 'ro', 'sa', 'ti', 'u', 'vi', 'wa', 'xe', 'yo', 'ze')
+
+
+class Rollback(Exception):
+	pass
+
+
+def make_name(rand):
+	return ''.join(rand.choice(SYLLABLES) for i in range(rand.randint(2, 4))).capitalize()
+
+
+def database_lookup(token, limit):
+	# the istartswith filters the account search used to run
+	if '@' in token:
+		users = Account.objects.filter(email__istartswith=token.split('@')[0])
+	else:
+		tokens = token.split()
+		users = Account.objects.filter(first_name__istartswith=tokens[0])
+		users |= Account.objects.filter(last_name__istartswith=tokens[-1])
+	return list(users.values_list('id', flat=True)[:limit])
+
+
+class Command(BaseCommand):
+	help = 'Compare typeahead lookups with the istartswith account search on generated accounts, all changes are rolled back'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--accounts', type=int, default=100000, help='Accounts generated for the benchmark')
+		parser.add_argument('--queries', type=int, default=500, help='Prefixes looked up per method')
+		parser.add_argument('--seed', type=int, default=0)
+
+	def run(self, label, lookup, prefixes):
+		elapsed, queries, found = 0, 0, 0
+		for prefix in prefixes:
+			reset_queries()
+			with CaptureQueriesContext(connection) as captured:
+				started = time.time()
+				found += len(lookup(prefix))
+				elapsed += time.time() - started
+			queries += len(captured)
+		self.stdout.write('%-28s %10.3f ms/query %6.1f queries/query %6.1f results/query' % (
+			label, elapsed * 1000 / len(prefixes), queries / float(len(prefixes)), found / float(len(prefixes))))
+
+	def handle(self, *args, **options):
+		rand = random.Random(options['seed'])
+		prefix = 'benchmark-%s' % uuid.uuid4().hex[:8]
+		names = [(make_name(rand), make_name(rand)) for i in range(options['accounts'])]
+		prefixes = []
+		for i in range(options['queries']):
+			first_name, last_name = rand.choice(names)
+			prefixes.append(rand.choice((
+				first_name[:rand.randint(1, 4)],
+				last_name[:rand.randint(2, 5)],
+				'%s %s' % (first_name, last_name[:rand.randint(1, 3)]),
+				'%s-%d@' % (prefix, rand.randrange(options['accounts'])),
+			)))
+
+		try:
+			with transaction.atomic():
+				Account.objects.bulk_create([Account(email='%s-%d@example.com' % (prefix, i), first_name=first_name, last_name=last_name)
+				                             for i, (first_name, last_name) in enumerate(names)], batch_size=500)
+				self.stdout.write('%d accounts, %d prefixes' % (Account.objects.count(), len(prefixes)))
+
+				typeahead = AccountTypeahead()
+				started = time.time()
+				index = typeahead.get_index()
+				self.stdout.write('Index built in %.2fs, %d keys' % (time.time() - started, len(index.keys)))
+
+				queryset = MiniAccountSerializer.setup_eager_loading(Account.objects.all())
+				self.run('istartswith', lambda token: database_lookup(token, TYPEAHEAD_LIMIT), prefixes)
+				self.run('typeahead lookup', lambda token: index.lookup(normalize(token), TYPEAHEAD_LIMIT), prefixes)
+				self.run('typeahead + in_bulk', lambda token: hydrate(queryset, typeahead.lookup(token)), prefixes)
+				raise Rollback
+		except Rollback:
+			pass
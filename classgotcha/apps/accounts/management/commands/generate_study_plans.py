@@ -0,0 +1,87 @@
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ...script import due_tasks_filter, load_calendars, lock_accounts, plan_preparations, save_preparations
+from ....tasks.models import Task
+
+STAGES = ('load', 'plan', 'write')
+
+
+def close_connections():
+	# Forked workers must not reuse the parent's database connection
+	connections.close_all()
+
+
+def plan_chunk(account_ids, now):
+	timings = dict.fromkeys(STAGES, 0.0)
+
+	# the chunk's accounts stay locked from loading to writing, /account/plan/ of one of them waits for it
+	with transaction.atomic():
+		started = time.time()
+		lock_accounts(account_ids)
+		calendars = load_calendars(account_ids, now)
+		timings['load'] = time.time() - started
+
+		started = time.time()
+		preparations = []
+		for account_id, (due_tasks, free_time, planned) in calendars.items():
+			preparations += plan_preparations(account_id, due_tasks, free_time, now, planned)
+		timings['plan'] = time.time() - started
+
+		started = time.time()
+		save_preparations(preparations)
+		timings['write'] = time.time() - started
+	return len(account_ids), len(preparations), timings
+
+
+class Command(BaseCommand):
+	help = 'Plan preparation sessions for the upcoming tasks of every account, safe to rerun'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--workers', type=int, default=cpu_count(), help='Number of worker processes, 1 runs inline')
+		parser.add_argument('--chunk-size', type=int, default=200, help='Accounts loaded, planned and written per chunk')
+
+	def handle(self, *args, **options):
+		now = timezone.now()
+		# Accounts already planned for everything are dropped by load_calendars without writing anything
+		account_ids = list(Task.involved.through.objects.filter(task__in=due_tasks_filter(now))
+		                   .order_by('account_id').values_list('account_id', flat=True).distinct())
+		chunk_size = options['chunk_size']
+		chunks = [account_ids[i:i + chunk_size] for i in range(0, len(account_ids), chunk_size)]
+
+		if options['workers'] > 1:
+			close_connections()
+			pool = Pool(options['workers'], initializer=close_connections)
+			results = pool.imap_unordered(partial(plan_chunk, now=now), chunks)
+		else:
+			pool = None
+			results = (plan_chunk(chunk, now) for chunk in chunks)
+
+		started = time.time()
+		done, planned = 0, 0
+		timings = dict.fromkeys(STAGES, 0.0)
+		try:
+			for count, preparations, chunk_timings in results:
+				done += count
+				planned += preparations
+				for stage in STAGES:
+					timings[stage] += chunk_timings[stage]
+				self.stdout.write('%d/%d accounts (%.1f accounts/sec)' % (done, len(account_ids), done / max(time.time() - started, 1e-6)))
+		except BaseException:
+			if pool:
+				pool.terminate()
+			raise
+		if pool:
+			pool.close()
+			pool.join()
+
+		elapsed = time.time() - started
+		self.stdout.write('Planned %d preparations for %d accounts in %.1fs (%.1f accounts/sec)' % (
+			planned, done, elapsed, done / max(elapsed, 1e-6)))
+		# Summed over the workers, so with several workers they add up to more than the wall time
+		self.stdout.write('Stage totals: ' + ', '.join('%s %.2fs' % (stage, timings[stage]) for stage in STAGES))
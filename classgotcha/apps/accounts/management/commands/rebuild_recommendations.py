@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from multiprocessing import Pool, cpu_count
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from ...models import Account
+from ...recommendations import RECOMMENDATIONS_MAX_AGE, compute_recommendations, store_recommendations
+
+
+def close_connections():
+	# Forked workers must not reuse the parent's database connection
+	connections.close_all()
+
+
+def rebuild_chunk(account_ids):
+	store_recommendations(dict((account_id, compute_recommendations(account_id)) for account_id in account_ids))
+	return account_ids[-1], len(account_ids)
+
+
+class Command(BaseCommand):
+	help = 'Rebuild stored friend recommendations in parallel worker processes'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--workers', type=int, default=cpu_count(), help='Number of worker processes, 1 runs inline')
+		parser.add_argument('--chunk-size', type=int, default=500, help='Accounts computed and written per chunk')
+		parser.add_argument('--all', action='store_true', help='Rebuild every account, not only missing, dirty or stale rows')
+		parser.add_argument('--checkpoint', default='local/tmp/recommendations.checkpoint', help='File recording the last finished account id')
+		parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+
+	def handle(self, *args, **options):
+		checkpoint = options['checkpoint']
+		last_id = 0
+		if not options['restart'] and os.path.exists(checkpoint):
+			with open(checkpoint) as f:
+				last_id = json.load(f)['last_id']
+			self.stdout.write('Resuming after account %d' % last_id)
+
+		accounts = Account.objects.filter(pk__gt=last_id)
+		if not options['all']:
+			accounts = accounts.filter(Q(friend_recommendation=None) |
+			                           Q(friend_recommendation__dirty=True) |
+			                           Q(friend_recommendation__updated__lt=timezone.now() - RECOMMENDATIONS_MAX_AGE / 2))
+		account_ids = list(accounts.order_by('pk').values_list('pk', flat=True))
+		chunk_size = options['chunk_size']
+		chunks = [account_ids[i:i + chunk_size] for i in range(0, len(account_ids), chunk_size)]
+
+		if options['workers'] > 1:
+			close_connections()
+			pool = Pool(options['workers'], initializer=close_connections)
+			results = pool.imap(rebuild_chunk, chunks)
+		else:
+			pool = None
+			results = (rebuild_chunk(chunk) for chunk in chunks)
+
+		started = time.time()
+		done = 0
+		try:
+			# imap yields in submission order, so the checkpoint only ever covers finished chunks
+			for chunk_last_id, count in results:
+				done += count
+				with open(checkpoint, 'w') as f:
+					json.dump({'last_id': chunk_last_id}, f)
+				self.stdout.write('%d/%d accounts (%.1f accounts/sec)' % (done, len(account_ids), done / max(time.time() - started, 1e-6)))
+		except BaseException:
+			# keep the checkpoint so the next run resumes from here
+			if pool:
+				pool.terminate()
+			raise
+		if pool:
+			pool.close()
+			pool.join()
+
+		if os.path.exists(checkpoint):
+			os.remove(checkpoint)
+		self.stdout.write('Rebuilt recommendations for %d accounts' % done)
@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Avg
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 from ..tags.models import Tag
+from ..typeahead import account_typeahead
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
 
@@ -42,6 +45,9 @@ class Professor(models.Model):
 	office = models.CharField(max_length=100, blank=True)
 	personal_page = models.CharField(max_length=100, blank=True)
 
+	# Normalized "FIRST|LAST", used to match professors when importing
+	name_key = models.CharField(max_length=81, db_index=True, editable=False, default='')
+
 	# department = models.CharField(max_length=100, blank=True)
 	# Relationship
 	# major = models.ForeignKey('classrooms.Major')
@@ -58,6 +64,14 @@ class Professor(models.Model):
 	def __unicode__(self):
 		return '%s %s' % (self.first_name, self.last_name)
 
+	@staticmethod
+	def make_name_key(first_name, last_name):
+		return '%s|%s' % (' '.join(first_name.upper().split()), ' '.join(last_name.upper().split()))
+
+	def save(self, *args, **kwargs):
+		self.name_key = self.make_name_key(self.first_name, self.last_name)
+		super(Professor, self).save(*args, **kwargs)
+
 	@property
 	def department(self):
 		return self.major.department
@@ -85,7 +99,8 @@ class Account(AbstractBaseUser, PermissionsMixin):
 
 	# Timestamp
 	created = models.DateTimeField(auto_now_add=True)
-	updated = models.DateTimeField(auto_now=True)
+	# Indexed for the typeahead catching up on the accounts changed since its last sync
+	updated = models.DateTimeField(auto_now=True, db_index=True)
 
 	# Personal info
 	first_name = models.CharField(max_length=40, blank=True)
@@ -194,3 +209,25 @@ class Group(models.Model):
 
 # Relatives
 # 1) chatrooms
+
+
+class FriendRecommendation(models.Model):
+	account = models.OneToOneField(Account, related_name='friend_recommendation', on_delete=models.CASCADE)
+	recommended = models.TextField(blank=True, help_text="Comma separated account ids, best match first")
+	# Set when the account's classmates changed, picked up by rebuild_recommendations
+	dirty = models.BooleanField(default=False)
+	# Timestamp
+	updated = models.DateTimeField(auto_now=True)
+
+	@property
+	def account_ids(self):
+		return [int(pk) for pk in self.recommended.split(',') if pk]
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def account_saved(sender, instance, update_fields=None, **kwargs):
+	if update_fields and not update_fields.intersection(account_typeahead.fields):
+		return
+	account_id = instance.id
+	transaction.on_commit(lambda: account_typeahead.update([account_id]))
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from models import Account, FriendRecommendation
+from ..classrooms.models import Classroom
+
+# Stored recommendations older than this are recomputed when requested,
+# rebuild_recommendations keeps every account well within it
+RECOMMENDATIONS_MAX_AGE = timedelta(days=2)
+RECOMMENDATIONS_PAGE_SIZE = 20
+
+# account x classroom incidence table
+ClassroomStudent = Classroom.students.through
+Friendship = Account.friends.through
+PendingFriendship = Account.pending_friends.through
+
+
+def could_be_friends(mine, his, shared):
+	# Same rule the old per-account similarity check applied to classroom sets:
+	# one set contains the other, or they share at least two classrooms
+	return mine > 0 and his > 0 and (shared == mine or (shared == his and his < mine) or shared >= 2)
+
+
+def excluded_ids(account_id):
+	"""Ids never recommended to the account: its friends and the friend requests it received or sent."""
+	excluded = set(Friendship.objects.filter(from_account_id=account_id).values_list('to_account_id', flat=True))
+	excluded |= set(PendingFriendship.objects.filter(from_account_id=account_id).values_list('to_account_id', flat=True))
+	excluded |= set(PendingFriendship.objects.filter(to_account_id=account_id).values_list('from_account_id', flat=True))
+	return excluded
+
+
+def compute_recommendations(account_id):
+	"""
+	Rank every account sharing classrooms with the given one.
+
+	Works on the classroom incidence table in three grouped queries (shared classrooms,
+	classroom totals and mutual friends) instead of loading each account's classrooms.
+	Returns account ids ordered by shared classrooms, then mutual friends.
+	"""
+	my_classrooms = ClassroomStudent.objects.filter(account_id=account_id).values('classroom_id')
+	mine = my_classrooms.count()
+	if not mine:
+		return []
+
+	classmates = ClassroomStudent.objects.filter(classroom_id__in=my_classrooms).exclude(account_id=account_id)
+	shared = dict(classmates.values('account_id').annotate(count=Count('classroom_id')).values_list('account_id', 'count'))
+
+	friends = Friendship.objects.filter(from_account_id=account_id).values_list('to_account_id', flat=True)
+	candidates = set(shared) - excluded_ids(account_id)
+	if not candidates:
+		return []
+
+	classmate_ids = classmates.values('account_id')
+	totals = dict(ClassroomStudent.objects.filter(account_id__in=classmate_ids).order_by()
+	              .values('account_id').annotate(count=Count('classroom_id')).values_list('account_id', 'count'))
+	mutual = dict(Friendship.objects.filter(from_account_id__in=friends, to_account_id__in=classmate_ids)
+	              .order_by().values('to_account_id').annotate(count=Count('from_account_id')).values_list('to_account_id', 'count'))
+
+	recommended = [pk for pk in candidates if could_be_friends(mine, totals.get(pk, 0), shared[pk])]
+	return sorted(recommended, key=lambda pk: (-shared[pk], -mutual.get(pk, 0), pk))
+
+
+def store_recommendations(recommendations):
+	"""Persist a {account_id: [recommended ids]} mapping, replacing the existing rows."""
+	with transaction.atomic():
+		FriendRecommendation.objects.filter(account_id__in=list(recommendations)).delete()
+		FriendRecommendation.objects.bulk_create([
+			FriendRecommendation(account_id=account_id, recommended=','.join(str(pk) for pk in recommended))
+			for account_id, recommended in recommendations.items()
+		])
+
+
+def refresh_recommendations(account_id):
+	recommended = compute_recommendations(account_id)
+	store_recommendations({account_id: recommended})
+	return recommended
+
+
+def get_recommendations(account, page=1):
+	"""
+	Return one page of recommended account ids from the stored table.
+
+	Only accounts without a row yet (or whose row outlived RECOMMENDATIONS_MAX_AGE,
+	which means the rebuild job is not running) are computed on demand. A stored row may
+	predate the latest friend requests, those accounts are dropped before paginating so
+	that pages stay full.
+	"""
+	stored = FriendRecommendation.objects.filter(account_id=account.id).first()
+	if stored is None or stored.updated < timezone.now() - RECOMMENDATIONS_MAX_AGE:
+		recommended = refresh_recommendations(account.id)
+	else:
+		excluded = excluded_ids(account.id)
+		recommended = [pk for pk in stored.account_ids if pk not in excluded]
+	start = (page - 1) * RECOMMENDATIONS_PAGE_SIZE
+	return recommended[start:start + RECOMMENDATIONS_PAGE_SIZE]
+
+
+def classrooms_changed(account, classroom_ids):
+	"""
+	Refresh after account joined or left classrooms.
+
+	The account itself is recomputed right away, only the classmates of those classrooms
+	can see their overlap change so they are marked for the next rebuild.
+	"""
+	classmate_ids = ClassroomStudent.objects.filter(classroom_id__in=classroom_ids).values('account_id')
+	FriendRecommendation.objects.filter(account_id__in=classmate_ids).update(dirty=True)
+	refresh_recommendations(account.id)
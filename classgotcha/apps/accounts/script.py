@@ -1,127 +1,233 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from django.db import models
-from datetime import datetime, timedelta, time, date
 
-from ..accounts.models import Account, Group
-from ..classrooms.models import Classroom
+from models import Account
+from ..tasks.ical import touch_calendar
 from ..tasks.models import Task
+from ..tasks.recurrence import expand
+
+# Tasks that take up time in the calendar, the other categories only have a due date
+BUSY_CATEGORIES = (Task.CLASS, Task.EXAM, Task.GROUP_MEETING, Task.OTHER)
+# Days before the due date each preparation aims for, homework gets one, quizzes two and exams three
+PREPARATION_DAYS = {Task.HOMEWORK: (2,), Task.QUIZ: (2, 5), Task.EXAM: (2, 5, 10)}
+PREPARATION_TITLES = {Task.HOMEWORK: 'Do ', Task.QUIZ: 'Prepare for ', Task.EXAM: 'Prepare for '}
+
+# Preparations go into a free gap of at least MIN_GAP within the study hours of a day,
+# starting SESSION_OFFSET into the gap and lasting SESSION_LENGTH
+STUDY_HOURS = (time(9, 0), time(23, 59, 59))
+MIN_GAP = timedelta(hours=1, minutes=30)
+SESSION_OFFSET = timedelta(minutes=15)
+SESSION_LENGTH = timedelta(hours=1)
 
-def test_scheduler():
-	account = Account.objects.all().filter(username='test1')[0]
-	task = account.tasks.all().filter(category=1)[0]
-	generate_recommendations_for_homework(account, task)
-
-
-def generate_recommendations(account, task, pre_days=2):
-	due_day = task.end
-	work_day = (due_day - timedelta(days=pre_days)).date()
-	title = {
-		1: "Do ",
-		2: "Prepare for ",
-		3: "Prepare for "
-	}[task.category] + task.task_name + ' of %s' % task.task_of_classroom.class_short if task.task_of_classroom else ''
-
-	# get the user's free time (within 8-24)
-	free_intervals = get_user_free_intervals(account=account, day=work_day, start=time(9,0), end=time(23,59,59))
-	
-	#print free_intervals
-	for interval in free_intervals:
-		# find appropriate time to do things
-		print interval
-		a,b = map(lambda x: datetime.combine(date.today(), x), interval)
-		print a,b
-		if b-a > timedelta(hours=1, minutes=30):
-			new_task = Task.objects.create(
-				task_name=title,
-				category=6,
-				start=datetime.combine(work_day, (a+timedelta(minutes=15)).time()),
-				end=datetime.combine(work_day, (a+timedelta(minutes=75)).time()),
-				classroom=task.task_of_classroom, creator=account)
-			new_task.involved.add(account)
-			return False
-	return True
-	
-
-
-def generate_recommendations_for_user(account, task):
-	if task.category in [1,2,3] and not task.preparations.all():
-		for d in [2,5,10][0:task.category]:
-			while generate_recommendations(account, task, pre_days=d):
-				d += 1
-	return
-
-
-
-def get_user_free_intervals(account, day, start = time(0,0,0), end = time(23,59,59)):
-	busy_intervals = []
-	weekday = day.strftime("%a")[0:2] # Get the first two characters of weekday string
-
-	tasks = account.tasks.filter(category__in=[0,3,5,6], repeat__contains=weekday, )
-	busy_intervals += [(task.start.time(), task.end.time()) for task in tasks]
-	
-	# all_non_repeat_tasks = account.tasks.filter(category=6, start__year=day.year, start__month=day.month, start__day=day.day)
-	all_non_repeat_tasks = account.tasks.filter(category=6, start=day)
-	busy_intervals += [(task.start.time(), task.end.time()) for task in all_non_repeat_tasks]
-
-	intervals = combine(busy_intervals) # union
-
-	# compute the complement of all the intervals
-	free_intervals = complement(intervals, first=start, last=end)
-
-	return free_intervals
-
-
-# Copied from http://nullege.com/codes/search/Intervals.complement
-def complement(intervals, first=None, last=None):
+
+class FreeTime(object):
 	"""
-	complement a list of intervals with intervals not in list.
+	Busy time of one account as a sorted array of disjoint intervals.
+
+	Built once from the whole calendar, answers free slot queries with a binary search
+	and takes new bookings in place so that later queries see them.
 	"""
-	# print 'intervals', intervals
-	if len(intervals) == 0:
-		if (first or first == 0) and last:
-			# print "here"
-			return [(first, last)]
+
+	def __init__(self, intervals=()):
+		self.starts, self.ends = [], []
+		for start, end in sorted(intervals):
+			if self.ends and start <= self.ends[-1]:
+				self.ends[-1] = max(self.ends[-1], end)
+			else:
+				self.starts.append(start)
+				self.ends.append(end)
+
+	def book(self, start, end):
+		# intervals [i, j) overlap or touch the new one and are merged into it
+		i = bisect_left(self.ends, start)
+		j = bisect_right(self.starts, end)
+		if i < j:
+			start, end = min(start, self.starts[i]), max(end, self.ends[j - 1])
+		self.starts[i:j] = [start]
+		self.ends[i:j] = [end]
+
+	def first_gap(self, earliest, latest, length):
+		"""Start of the first free gap of at least `length` between earliest and latest, or None."""
+		start = earliest
+		i = bisect_right(self.ends, start)
+		while start + length <= latest:
+			if i == len(self.starts) or self.starts[i] >= start + length:
+				return start
+			start = max(start, self.ends[i])
+			i += 1
+		return None
+
+
+def local_datetime(day, at):
+	return timezone.make_aware(datetime.combine(day, at))
+
+
+def busy_intervals(tasks, first_day, last_day):
+	"""Yield the (start, end) of every task between first_day and last_day, repeating tasks once per matching day."""
+	repeating = []
+	for task in tasks:
+		if not task.start or not task.end:
+			continue
+		if task.weekdays:
+			repeating.append(task)
 		else:
-			return []
-	new_intervals = []
-	intervals.sort()
-
-	last_from, last_to = intervals[0]
-	if first < last_from:
-		new_intervals.append((first, last_from))
-	for this_from, this_to in intervals[1:]:
-		if this_from > last_to:
-			new_intervals.append((last_to, this_from))
-		last_from = this_from
-		last_to = max(last_to, this_to)
-	if last and last > last_to:
-		new_intervals.append((last_to, last))
-	return new_intervals
-
-
-def combine(intervals):
+			yield task.start, task.end
+
+	times = dict((task.id, (timezone.localtime(task.start).time(), timezone.localtime(task.end).time())) for task in repeating)
+	for task, day in expand(repeating, first_day, last_day):
+		start, end = times[task.id]
+		if start < end:
+			yield local_datetime(day, start), local_datetime(day, end)
+
+
+def due_tasks_filter(now):
+	return Task.objects.filter(category__in=PREPARATION_DAYS.keys(), end__gt=now)
+
+
+def missing_days(days, due_day, planned_days):
 	"""
-	combine intervals.
+	The preparation days of `days` not covered by the sessions already planned on planned_days.
 
-	Overlapping intervals are concatenated into larger intervals.
+	A preparation aiming for d days before due_day lands d or more days before it, the
+	sessions are matched to the farthest aims first so that each covers at most one.
 	"""
-	if not intervals:
-		return []
+	before = sorted((due_day - day).days for day in planned_days)
+	missing = []
+	for days_before in sorted(days, reverse=True):
+		i = bisect_left(before, days_before)
+		if i < len(before):
+			del before[i]
+		else:
+			missing.append(days_before)
+	return [days_before for days_before in days if days_before in missing]
 
-	new_intervals = []
 
-	intervals.sort()
-	first_from, last_to = intervals[0]
+def load_tasks(account_ids, tasks):
+	"""{account_id: [task]} for the given Task queryset, every task is loaded once however many accounts share it."""
+	involved = Task.involved.through.objects.filter(account_id__in=account_ids)
+	tasks = dict((task.id, task) for task in tasks.filter(pk__in=involved.values('task_id')))
+	by_account = {}
+	for account_id, task_id in involved.filter(task_id__in=list(tasks)).values_list('account_id', 'task_id'):
+		by_account.setdefault(account_id, []).append(tasks[task_id])
+	return by_account
 
-	for this_from, this_to in intervals[1:]:
-		if this_from > last_to:
-			new_intervals.append((first_from, last_to))
-			first_from, last_to = this_from, this_to
-			continue
 
-		if last_to < this_to:
-			last_to = this_to
+def load_calendars(account_ids, now):
+	"""
+	Return {account_id: (due tasks, FreeTime, planned)} for the accounts with something to plan.
+
+	Due tasks are the upcoming homework, quizzes and exams the account hasn't planned
+	every preparation for yet, planned has the days of the sessions they already have
+	by task id. Costs five queries for any number of accounts.
+	"""
+	due = load_tasks(account_ids, due_tasks_filter(now).select_related('task_of_classroom__major')
+	                 .only('task_name', 'category', 'end', 'task_of_classroom__class_number', 'task_of_classroom__major__major_short'))
+	planned = {}
+	for creator_id, parent_id, start in Task.objects.filter(creator_id__in=account_ids, belongs_to__isnull=False) \
+			.values_list('creator_id', 'belongs_to_id', 'start'):
+		planned.setdefault(creator_id, {}).setdefault(parent_id, []).append(timezone.localtime(start).date())
+	for account_id in list(due):
+		# partly planned tasks stay due, the sessions that found no free day are retried
+		sessions = planned.get(account_id, {})
+		due[account_id] = [task for task in due[account_id] if len(sessions.get(task.id, ())) < len(PREPARATION_DAYS[task.category])]
+		if not due[account_id]:
+			del due[account_id]
+	if not due:
+		return {}
+
+	first_day = timezone.localtime(now).date()
+	last_day = max(timezone.localtime(task.end).date() for tasks in due.values() for task in tasks)
+	overlapping = Q(start__lt=local_datetime(last_day + timedelta(days=1), time(0, 0)), end__gt=local_datetime(first_day, time(0, 0)))
+	busy = load_tasks(list(due), Task.objects.filter(Q(weekdays__gt=0) | overlapping, category__in=BUSY_CATEGORIES)
+	                  .only('start', 'end', 'weekdays', 'repeat_start', 'repeat_end'))
+	return dict((account_id, (tasks, FreeTime(busy_intervals(busy.get(account_id, ()), first_day, last_day)), planned.get(account_id, {})))
+	            for account_id, tasks in due.items())
+
+
+def plan_preparations(account_id, due_tasks, free_time, now, planned=None):
+	"""
+	Pick preparation sessions for due_tasks from the account's FreeTime, returns unsaved Task rows.
+
+	Each preparation aims for its PREPARATION_DAYS before the due date and moves to earlier
+	days until one has a free gap, it is given up when that would be in the past.
+	Preparations covered by the sessions in planned ({task id: [day]}) are skipped.
+	"""
+	today = timezone.localtime(now).date()
+	preparations = []
+	for task in sorted(due_tasks, key=lambda task: task.end):
+		title = PREPARATION_TITLES[task.category] + task.task_name
+		if task.task_of_classroom:
+			title += ' of %s' % task.task_of_classroom.class_short
+		due_day = timezone.localtime(task.end).date()
+
+		for days in missing_days(PREPARATION_DAYS[task.category], due_day, (planned or {}).get(task.id, ())):
+			day = due_day - timedelta(days=days)
+			while day >= today:
+				earliest = max(now, local_datetime(day, STUDY_HOURS[0]))
+				gap = free_time.first_gap(earliest, local_datetime(day, STUDY_HOURS[1]), MIN_GAP)
+				if gap:
+					start = gap + SESSION_OFFSET
+					free_time.book(start, start + SESSION_LENGTH)
+					preparations.append(Task(task_name=title[:50], category=Task.OTHER, start=start, end=start + SESSION_LENGTH,
+					                         belongs_to_id=task.id, task_of_classroom_id=task.task_of_classroom_id,
+					                         creator_id=account_id))
+					break
+				day -= timedelta(days=1)
+	return preparations
+
+
+def lock_accounts(account_ids):
+	"""
+	Lock the account rows until the transaction ends, so that one planner at a time plans an account.
 
-	new_intervals.append((first_from, last_to))
+	It must come first in the transaction, the calendars are then read after a concurrent
+	planner of the same accounts committed and include its preparations.
+	"""
+	if connection.features.has_select_for_update:
+		list(Account.objects.select_for_update().filter(pk__in=account_ids).values_list('pk', flat=True))
+	else:
+		# SQLite has no row locks, a write takes its database lock up front, which a read followed by writes can't wait for
+		Account.objects.filter(pk__in=account_ids).update(exp=F('exp'))
+
+
+def save_preparations(preparations):
+	"""Insert the preparations and add them to their creators' calendars, a fixed number of queries for any amount."""
+	if not preparations:
+		return
+	Task.objects.bulk_create(preparations)
+
+	# MySQL doesn't return the ids of bulk inserted rows, look them up by their parent tasks
+	pairs = set((preparation.creator_id, preparation.belongs_to_id) for preparation in preparations)
+	creators = set(creator_id for creator_id, parent_id in pairs)
+	saved = [(pk, creator_id) for pk, creator_id, parent_id in
+	         Task.objects.filter(creator_id__in=creators, belongs_to_id__in=set(parent_id for creator_id, parent_id in pairs))
+	         .values_list('id', 'creator_id', 'belongs_to_id') if (creator_id, parent_id) in pairs]
+	involved = set(Task.involved.through.objects.filter(task_id__in=[pk for pk, creator_id in saved]).values_list('task_id', 'account_id'))
+	Task.involved.through.objects.bulk_create([Task.involved.through(task_id=pk, account_id=creator_id)
+	                                           for pk, creator_id in saved if (pk, creator_id) not in involved])
+	touch_calendar(*creators)
+
+
+def generate_study_plans(account_ids, now=None):
+	"""
+	Plan preparation sessions for every upcoming task of the accounts.
 
-	return new_intervals
+	Calendars are loaded once over the planning horizon and searched in memory,
+	the preparations are written in bulk. Returns the new preparation tasks.
+	"""
+	now = now or timezone.now()
+	preparations = []
+	with transaction.atomic():
+		lock_accounts(account_ids)
+		for account_id, (due_tasks, free_time, planned) in load_calendars(account_ids, now).items():
+			preparations += plan_preparations(account_id, due_tasks, free_time, now, planned)
+		save_preparations(preparations)
+	return preparations
+
+
+def generate_study_plan(account, now=None):
+	return generate_study_plans([account.id], now)
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from models import Account, Group, Professor
 # from ..chatrooms.models import Chatroom
 from ..classrooms.models import Semester, Classroom, Major, OfficeHour
+from ..mixins import EagerLoadingMixin
 from ..tasks.serializers import BasicTaskSerializer, ClassTimeTaskSerializer
 from ..tags.serializers import ClassFolderSerializer
 from ..badges.serializers import BadgeSerializer
@@ -23,14 +24,14 @@ class MajorSerializer(serializers.ModelSerializer):
 		fields = '__all__'
 
 
-class MiniMajorSerializer(serializers.ModelSerializer):
+class MiniMajorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class Meta:
 		model = Major
 		fields = ['major_short']
 
 
 # WARN: Duplicate
-class SemesterSerializer(serializers.ModelSerializer):
+class SemesterSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	formatted_start_date = serializers.ReadOnlyField()
 	formatted_end_date = serializers.ReadOnlyField()
 
@@ -39,7 +40,7 @@ class SemesterSerializer(serializers.ModelSerializer):
 		fields = ('name', 'formatted_start_date', 'formatted_end_date')
 
 
-class BasicProfessorSerializer(serializers.ModelSerializer):
+class BasicProfessorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class Meta:
 		model = Professor
 		fields = ['full_name', 'email', 'id']
@@ -47,13 +48,14 @@ class BasicProfessorSerializer(serializers.ModelSerializer):
 
 
 # WARN: Duplicate
-class BasicClassroomSerializer(serializers.ModelSerializer):
+class BasicClassroomSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	students_count = serializers.ReadOnlyField()
 	class_short = serializers.ReadOnlyField()
 	class_time = ClassTimeTaskSerializer()
 	semester = SemesterSerializer()
 	professors = BasicProfessorSerializer(many=True)
 	folders = ClassFolderSerializer(many=True)
+	select_related_fields = ('major',)
 
 	class Meta:
 		model = Classroom
@@ -61,7 +63,7 @@ class BasicClassroomSerializer(serializers.ModelSerializer):
 		          'class_section', 'description', 'class_time', 'semester', 'professors', 'folders')
 
 
-class ProfessorOfficeHourSerializer(serializers.ModelSerializer):
+class ProfessorOfficeHourSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	classroom = BasicClassroomSerializer()
 	time = ClassTimeTaskSerializer()
 
@@ -70,11 +72,12 @@ class ProfessorOfficeHourSerializer(serializers.ModelSerializer):
 		fields = ('classroom', 'time')
 
 
-class ProfessorSerializer(serializers.ModelSerializer):
+class ProfessorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	full_name = serializers.ReadOnlyField()
 	classrooms = BasicClassroomSerializer(many=True)
 	office_hours = ProfessorOfficeHourSerializer(many=True)
 	avg_rate = serializers.ReadOnlyField()
+	prefetch_related_fields = ('tags',)
 
 	class Meta:
 		model = Professor
@@ -82,7 +85,7 @@ class ProfessorSerializer(serializers.ModelSerializer):
 		read_only_fields = ('created',)
 
 
-class BasicAccountSerializer(serializers.ModelSerializer):
+class BasicAccountSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	full_name = serializers.ReadOnlyField()
 	major = MiniMajorSerializer()
 
@@ -91,7 +94,7 @@ class BasicAccountSerializer(serializers.ModelSerializer):
 		fields = ('pk', 'id', 'avatar1x', 'avatar2x', 'username', 'email', 'full_name', 'about_me', 'level', 'school_year', 'major')
 
 
-class MiniAccountSerializer(serializers.ModelSerializer):
+class MiniAccountSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	full_name = serializers.ReadOnlyField()
 
 	class Meta:
@@ -110,13 +113,14 @@ class MiniAccountSerializer(serializers.ModelSerializer):
 # 		fields = '__all__'
 
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	classrooms = BasicClassroomSerializer(many=True)
 	is_professor = serializers.ReadOnlyField()
 	full_name = serializers.ReadOnlyField()
 	tasks = BasicTaskSerializer(many=True)
 	badges = BadgeSerializer(many=True)
 	major = MiniMajorSerializer()
+	prefetch_related_fields = ('friends', 'pending_friends')
 
 	class Meta:
 		model = Account
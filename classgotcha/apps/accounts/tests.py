@@ -0,0 +1,146 @@
+from StringIO import StringIO
+from datetime import datetime, time, timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from models import Account, Professor
+from script import generate_study_plan
+from ..badges.models import Badge, BadgeType
+from ..classrooms.models import Classroom, Major, Semester
+from ..tasks.models import Task
+from ..typeahead import AccountTypeahead, ClassroomTypeahead, account_typeahead, classroom_typeahead
+
+# account, friends, pending friends, classrooms (+ their professors and folders), tasks and badges
+ME_QUERIES = 8
+
+
+class MeQueriesTest(TestCase):
+	def setUp(self):
+		self.account = Account.objects.create(email='me@psu.edu', first_name='Me', last_name='Myself')
+		self.major = Major.objects.create(major_short='CMPSC')
+		self.semester = Semester.objects.create(name='Fall 2017')
+		self.client = APIClient()
+		self.client.force_authenticate(self.account)
+		self.count = 0
+
+	def add_rows(self, n):
+		for i in range(n):
+			self.count += 1
+			class_time = Task.objects.create(task_name='class %d' % self.count, category=Task.CLASS, repeat='MoWeFr')
+			classroom = Classroom.objects.create(class_name='Class %d' % self.count, class_number=str(100 + self.count),
+			                                     class_code=str(10000 + self.count), class_section='001', class_location='',
+			                                     class_time=class_time, major=self.major, semester=self.semester)
+			classroom.professors.add(Professor.objects.create(first_name='Prof', last_name=str(self.count), email=''))
+			classroom.students.add(self.account)
+			task = Task.objects.create(task_name='homework %d' % self.count, category=Task.HOMEWORK, task_of_classroom=classroom)
+			task.involved.add(self.account)
+			Badge.objects.create(account=self.account, badge_type=BadgeType.objects.create(name='badge %d' % self.count))
+
+	def get_me(self):
+		with self.assertNumQueries(ME_QUERIES):
+			response = self.client.get('/account/me/')
+		self.assertEqual(response.status_code, 200)
+		return response.data
+
+	def test_one_of_each(self):
+		self.add_rows(1)
+		data = self.get_me()
+		self.assertEqual((len(data['classrooms']), len(data['tasks']), len(data['badges'])), (1, 1, 1))
+
+	def test_many_of_each(self):
+		self.add_rows(10)
+		data = self.get_me()
+		self.assertEqual((len(data['classrooms']), len(data['tasks']), len(data['badges'])), (10, 10, 10))
+
+
+class StudyPlanTest(TestCase):
+	def setUp(self):
+		self.account = Account.objects.create(email='me@psu.edu')
+		self.now = timezone.now()
+		# preparations aim for 2, 5 and 10 days before the exam
+		self.exam = self.add_task('exam', Task.EXAM, self.day(12, 10), self.day(12, 11))
+
+	def day(self, days, hour, minute=0):
+		return timezone.make_aware(datetime.combine((timezone.localtime(self.now) + timedelta(days=days)).date(), time(hour, minute)))
+
+	def add_task(self, name, category, start, end):
+		task = Task.objects.create(task_name=name, category=category, start=start, end=end)
+		task.involved.add(self.account)
+		return task
+
+	def preparation_days(self):
+		return sorted((timezone.localtime(self.exam.end).date() - timezone.localtime(start).date()).days
+		              for start in Task.objects.filter(belongs_to=self.exam, creator=self.account).values_list('start', flat=True))
+
+	def test_partly_planned_task_is_retried(self):
+		# no free gap on the first three days, the preparation 10 days before can't be placed
+		busy = [self.add_task('busy', Task.OTHER, self.day(days, 8), self.day(days, 23, 30)) for days in range(3)]
+		generate_study_plan(self.account, self.now)
+		self.assertEqual(self.preparation_days(), [2, 5])
+
+		Task.objects.filter(pk__in=[task.pk for task in busy]).delete()
+		generate_study_plan(self.account, self.now)
+		self.assertEqual(self.preparation_days(), [2, 5, 10])
+		self.assertEqual(generate_study_plan(self.account, self.now), [])
+
+	def test_planning_again_adds_no_duplicates(self):
+		self.add_task('homework', Task.HOMEWORK, None, self.day(6, 23))
+		client = APIClient()
+		client.force_authenticate(self.account)
+		self.assertEqual(client.get('/account/plan/').status_code, 200)
+		planned = list(Task.objects.filter(creator=self.account, belongs_to__isnull=False).order_by('id').values_list('belongs_to', 'start'))
+		self.assertEqual(len(planned), 4)
+
+		call_command('generate_study_plans', workers=1, stdout=StringIO())
+		self.assertEqual(generate_study_plan(self.account, self.now), [])
+		self.assertEqual(list(Task.objects.filter(creator=self.account, belongs_to__isnull=False).order_by('id').values_list('belongs_to', 'start')), planned)
+
+
+class TypeaheadTest(TransactionTestCase):
+	# saves update the typeaheads on commit, which TestCase never reaches
+
+	def setUp(self):
+		account_typeahead.index = classroom_typeahead.index = None
+		self.account = Account.objects.create(email='ghopper@psu.edu', first_name='Grace', last_name='Hopper')
+		# this process indexes its own saves, the other one catches up when the shared version moved
+		self.other = AccountTypeahead()
+		self.assertEqual(account_typeahead.lookup('gra'), [self.account.pk])
+		self.assertEqual(self.other.lookup('hop'), [self.account.pk])
+
+	def test_rename(self):
+		self.account.first_name, self.account.last_name = 'Ada', 'Lovelace'
+		self.account.save()
+		for typeahead in (account_typeahead, self.other):
+			self.assertEqual(typeahead.lookup('grace'), [])
+			self.assertEqual(typeahead.lookup('hopper'), [])
+			self.assertEqual(typeahead.lookup('ada lo'), [self.account.pk])
+			self.assertEqual(typeahead.lookup('Lovelace'), [self.account.pk])
+			self.assertEqual(typeahead.lookup('ghop'), [self.account.pk])
+
+	def test_save_without_typeahead_fields_keeps_version(self):
+		version = account_typeahead.get_version()
+		self.account.about_me = 'Hi'
+		self.account.save(update_fields=['about_me', 'updated'])
+		self.assertEqual(account_typeahead.get_version(), version)
+		# a full save leaving the names alone doesn't move it either
+		self.account.save()
+		self.assertEqual(account_typeahead.get_version(), version)
+
+	def test_classroom_rename(self):
+		other = ClassroomTypeahead()
+		classroom = Classroom.objects.create(class_name='Compilers', class_number='471', class_code='10001', class_section='001', class_location='',
+		                                     major=Major.objects.create(major_short='CMPSC'), semester=Semester.objects.create(name='Fall 2017'))
+		self.assertEqual(other.lookup('cmpsc 4'), [classroom.pk])
+		version = classroom_typeahead.get_version()
+		classroom.syllabus = 'Week 1'
+		classroom.save(update_fields=['syllabus', 'updated'])
+		self.assertEqual(classroom_typeahead.get_version(), version)
+
+		classroom.class_name = 'Operating Systems'
+		classroom.save()
+		self.assertEqual(other.lookup('compilers'), [])
+		self.assertEqual(other.lookup('operating'), [classroom.pk])
+		self.assertEqual(other.lookup('cmpsc471'), [classroom.pk])
@@ -41,7 +41,13 @@ account_me = views.AccountViewSet.as_view({
 })
 
 account_classrooms = views.AccountViewSet.as_view({
-	'get': 'classrooms'
+	'get' : 'classrooms',
+	'post': 'classrooms'
+})
+
+account_classroom_conflicts = views.AccountViewSet.as_view({
+	'get' : 'conflicts',
+	'post': 'conflicts'
 })
 
 account_add_classrooms = views.AccountViewSet.as_view({
@@ -66,6 +72,10 @@ account_moments = views.AccountViewSet.as_view({
 	'get' : 'moments',
 })
 
+account_timeline = views.AccountViewSet.as_view({
+	'get': 'timeline'
+})
+
 add_delete_moments = views.AccountViewSet.as_view({
 	'post'  : 'moments',
 	'delete': 'moments'
@@ -88,6 +98,10 @@ account_search = views.AccountViewSet.as_view({
 	'post': 'search'
 })
 
+account_typeahead = views.AccountViewSet.as_view({
+	'get': 'typeahead'
+})
+
 account_plan = views.AccountViewSet.as_view({
 	'get': 'study_plan'
 })
@@ -106,6 +120,8 @@ urlpatterns = [
 	url(r'^avatar/change/$', views.account_avatar, name='user-avatar'),
 
 	url(r'^classrooms/(?P<pk>[0-9]+)/$', account_add_classrooms, name='add-classroom'),
+	url(r'^classrooms/(?P<pk>[0-9]+)/conflicts/$', account_classroom_conflicts, name='classroom-conflicts'),
+	url(r'^classrooms/conflicts/$', account_classroom_conflicts, name='classrooms-conflicts'),
 	url(r'^chatrooms/(?P<pk>[0-9]+)/$', account_add_chatrooms, name='add-chatrooms'),
 
 	url(r'^get_ical_token/$', account_get_iCal_token, name='get-ical-token'),
@@ -116,6 +132,7 @@ urlpatterns = [
 
 	url(r'^moments/$', account_moments, name='my-moments'),
 	url(r'^moments/(?P<moment_pk>[0-9]+)/$', account_moments, name='add-delete-moment'),
+	url(r'^timeline/$', account_timeline, name='user-timeline'),
 
 	url(r'^classrooms/$', account_classrooms, name='user-classrooms'),
 	url(r'^chatrooms/$', account_chatrooms, name='user-chatrooms'),
@@ -126,6 +143,7 @@ urlpatterns = [
 	url(r'^pending-friends/$', account_pending_friends, name='user-pending-friends'),
 	url(r'^recommend-friends/$', account_explore, name='user-explore-friends'),
 	url(r'^search/$', account_search, name='user-search'),
+	url(r'^typeahead/$', account_typeahead, name='user-typeahead'),
 	url(r'^login/$', obtain_jwt_token),
 	url(r'^login-refresh/$', refresh_jwt_token),
 	url(r'^login-verify/$', verify_jwt_token),
@@ -1,7 +1,9 @@
 import uuid
 from django.utils import timezone
-from datetime import timedelta, datetime
-from django.http import HttpResponse
+from datetime import timedelta
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import check_password
@@ -14,24 +16,33 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
 from ..classrooms.serializers import Classroom, BasicClassroomSerializer
+from ..classrooms.conflicts import find_conflicts
+from ..classrooms.enrollment import enroll, unenroll
 from ..posts.serializers import Moment, MomentSerializer, NoteSerializer, Comment, CommentSerializer
+from ..posts.pagination import paginate_moments
+from ..posts.timeline import get_timeline
 from ..chatrooms.serializers import ChatroomSerializer
 from ..tasks.serializers import TaskSerializer
+from ..tasks.ical import get_calendar_state, stream_calendar
 
-from ..notifications.models import Notification
+from ..notifications.dispatch import notify
+from ..typeahead import account_typeahead, hydrate
+from ..mixins import get_sparse_fieldset
 
 from models import Account, Professor, AccountVerifyToken
-from serializers import AccountSerializer, BasicAccountSerializer, AuthAccountSerializer, ProfessorSerializer
+from serializers import AccountSerializer, BasicAccountSerializer, MiniAccountSerializer, AuthAccountSerializer, ProfessorSerializer
 
-from script import generate_recommendations_for_user
+from script import generate_study_plan
+from recommendations import get_recommendations
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
-from ..badges.script import trigger_action
+from ..badges.script import trigger_action, trigger_actions
 from hashids import Hashids
 
 hashids = Hashids(salt="Full of salt..........")
 salt = 100000000
+ACCOUNT_SEARCH_LIMIT = 50
 
 
 def send_verifying_email(account, subject, to, template):
@@ -60,47 +71,20 @@ def send_verifying_email(account, subject, to, template):
 @api_view(['GET'])
 @permission_classes((AllowAny,))
 def ical_feed_view(request, token=None):
-	pk = hashids.decode(token)
-	if token and pk:
-		account = get_object_or_404(Account.objects.all(), pk = pk[0])
-		# if no start time is found, use -30 min in end time instead
-		f = open('local/tmp/cal.ics', mode='w')
-		f.write('BEGIN:VCALENDAR\n'
-			'PRODID:-//classgotcha.com//%s//EN\n'
-			'VERSION:2.0\n' % token)
-		for task in account.tasks.all():
-			start = task.start.replace(2017,8,21) if task.category in [0,7] else task.start if task.start else task.end - timedelta(0,0,0,0,30,0)
-			end = task.end.replace(2017,8,21) if task.category in [0,7] else task.end
-			
-			f.write('BEGIN:VEVENT' 
-				'\nUID:{1}@classgotcha.com'
-				'\nSUMMARY:{0}'
-				'\nLOCATION:{4}'
-				'\nDTSTART;TZID=America/New_York:{2}'
-				'\nDTEND;TZID=America/New_York:{3}'.format(
-					task.task_name,
-					task.id,
-					start.strftime("%Y%m%dT%H%M%S"),
-					end.strftime("%Y%m%dT%H%M%S"),
-					task.location
-				))
-				# '\nDTSTART:{1}Z'
-				# '\nDTEND:{2}Z'
-			if task.repeat:
-				f.write(
-					'\nRRULE:FREQ=WEEKLY;WKST=SU;UNTIL={0};BYDAY={1}'.format(
-						datetime(2017, 12, 10, 0, 0, 0).strftime("%Y%m%dT%H%M%S"),
-						(lambda x: ','.join(a + b for a, b in zip(x, x)))(iter(task.repeat.upper()))))
-
-			f.write('\nDESCRIPTION:%s'
-			        '\nEND:VEVENT\n' % task.description
-			        )
-		f.write('END:VCALENDAR')
-		f.close()
-		return HttpResponse(open('local/tmp/cal.ics', mode='r'))
-	else:
+	pk = hashids.decode(token) if token else None
+	if not pk:
 		return Response(status=status.HTTP_400_BAD_REQUEST)
 
+	account = get_object_or_404(Account.objects.all(), pk=pk[0])
+	# calendar clients poll constantly, answer with 304 while nothing changed
+	etag, last_modified = get_calendar_state(account)
+	response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+	if response is None:
+		response = StreamingHttpResponse(stream_calendar(account, token, etag), content_type='text/calendar; charset=utf-8')
+	response['ETag'] = quote_etag(etag)
+	response['Last-Modified'] = http_date(last_modified)
+	return response
+
 
 @api_view(['POST'])
 @permission_classes((AllowAny,))
@@ -124,7 +108,7 @@ def account_register(request):
 		account = Account.objects.get(email=referrer)
 		if account:
 			trigger_action(account, 'refer_friend')
-			Notification.objects.create(sender_id=user.id, content='joined ClassGotcha with your refer!', receiver_id=account.id)
+			notify(account.id, 'joined ClassGotcha with your refer!', sender_id=user.id)
 
 	send_verifying_email(account=user, subject='[ClassGotcha] Verification Email', to=user.email, template='verification')
 
@@ -155,7 +139,7 @@ def email_verify(request, token=None):
 			return Response({'message': 'Token is expired'}, status=status.HTTP_400_BAD_REQUEST)
 
 		token_instance.account.is_verified = True
-		token_instance.account.save()
+		token_instance.account.save(update_fields=['is_verified', 'updated'])
 		token_instance.expire_time = timezone.now() - timedelta(hours=24)
 		token_instance.save()
 		trigger_action(token_instance.account, 'verify_email')
@@ -195,7 +179,7 @@ def forget_password(request, token=None):
 			return Response(status=status.HTTP_404_NOT_FOUND)
 		# set new password to user
 		token_instance.account.set_password(request.data['password'])
-		token_instance.account.save()
+		token_instance.account.save(update_fields=['password', 'updated'])
 		token_instance.expire_time = timezone.now() - timedelta(hours=24)
 		return Response(status=status.HTTP_200_OK)
 
@@ -229,7 +213,7 @@ def account_avatar(request):
 		request.user.avatar1x = image1x_file
 		request.user.avatar2x = image2x_file
 
-		request.user.save()
+		request.user.save(update_fields=['avatar1x', 'avatar2x', 'updated'])
 		trigger_action(request.user, 'change_avatar')
 		return Response({'data': 'success'}, status=status.HTTP_200_OK)
 
@@ -244,8 +228,9 @@ class AccountViewSet(viewsets.ViewSet):
 		return Response({'token': hashids.encode(id,salt)})
 		
 	def retrieve(self, request, pk):
-		user = get_object_or_404(self.queryset, pk=pk)
-		serializer = AccountSerializer(user)
+		sparse = get_sparse_fieldset(request)
+		user = get_object_or_404(AccountSerializer.setup_eager_loading(self.queryset, **sparse), pk=pk)
+		serializer = AccountSerializer(user, **sparse)
 		return Response(serializer.data)
 
 	def destroy(self, request, pk=None):
@@ -257,25 +242,26 @@ class AccountViewSet(viewsets.ViewSet):
 			return Response(status=status.HTTP_403_FORBIDDEN)
 
 	def search(self, request):
+		# 'first last', last name or email prefixes, looked up in the in-process typeahead index
 		token = request.data.get('token', None)
 		if token:
-			if '@' in token:
-				token = token.split("@")[0]
-				users = Account.objects.filter(email__istartswith=token)
-			else:
-				tokens = token.split()
-				users = Account.objects.filter(first_name__istartswith=tokens[0])
-				users |= Account.objects.filter(last_name__istartswith=tokens[-1])
-
-			serializer = BasicAccountSerializer(users, many=True)
-
+			sparse = get_sparse_fieldset(request)
+			users = hydrate(BasicAccountSerializer.setup_eager_loading(Account.objects.all(), **sparse), account_typeahead.lookup(token, ACCOUNT_SEARCH_LIMIT))
+			serializer = BasicAccountSerializer(users, many=True, **sparse)
 			return Response(serializer.data)
 		else:
 			return Response(status=status.HTTP_400_BAD_REQUEST)
 
+	@staticmethod
+	def typeahead(request):
+		# fired on every keystroke, GET typeahead/?q=
+		users = hydrate(MiniAccountSerializer.setup_eager_loading(Account.objects.all()), account_typeahead.lookup(request.query_params.get('q', '')))
+		return Response(MiniAccountSerializer(users, many=True).data)
+
 	def friends(self, request, pk=None):
 		if request.method == 'GET':
-			serializer = BasicAccountSerializer(request.user.friends, many=True)
+			sparse = get_sparse_fieldset(request)
+			serializer = BasicAccountSerializer(BasicAccountSerializer.setup_eager_loading(request.user.friends.all(), **sparse), many=True, **sparse)
 			return Response(serializer.data)
 		# send friend request
 		if request.method == 'POST':
@@ -307,8 +293,7 @@ class AccountViewSet(viewsets.ViewSet):
 				request.user.pending_friends.remove(new_friend)
 				new_friend.friends.add(request.user)
 
-				trigger_action(request.user, 'accept_friend')
-				trigger_action(new_friend, 'accept_friend')
+				trigger_actions([(request.user, 'accept_friend'), (new_friend, 'accept_friend')])
 
 				return Response(status=200)
 
@@ -316,26 +301,32 @@ class AccountViewSet(viewsets.ViewSet):
 			nomore_friend = get_object_or_404(self.queryset, pk=pk)
 			# remove from user friend list
 			request.user.friends.remove(nomore_friend)
-			request.user.save()
+			request.user.save(update_fields=['updated'])
 			# if in pending friend list, remove from user pending friend list
 			request.user.pending_friends.remove(nomore_friend)
 			nomore_friend.friends.remove(request.user)
-			nomore_friend.save()
+			nomore_friend.save(update_fields=['updated'])
 			return Response(status=200)
 
 	@staticmethod
 	def me(request):
 		if request.method == 'GET':
-			serializer = AccountSerializer(request.user)
+			sparse = get_sparse_fieldset(request)
+			user = AccountSerializer.setup_eager_loading(Account.objects.all(), **sparse).get(pk=request.user.pk)
+			serializer = AccountSerializer(user, **sparse)
 			return Response(serializer.data)
 		elif request.method == 'PUT':
+			# only the fields sent are written, so the rosters are refreshed only for a name or major change
+			update_fields = ['updated']
 			for (key, value) in request.data.items():
 				if key == 'major':
 					request.user.major_id = value
+					update_fields.append('major')
 
 				if key in ['username', 'first_name', 'last_name', 'gender', 'birthday', 'school_year', 'about_me', 'phone', 'privacy_setting', 'facebook', 'twitter', 'linkedin', 'snapchat']:
 					setattr(request.user, key, value)
-				request.user.save()
+					update_fields.append(key)
+			request.user.save(update_fields=update_fields)
 			return Response(status=status.HTTP_200_OK)
 
 	@staticmethod
@@ -351,7 +342,7 @@ class AccountViewSet(viewsets.ViewSet):
 		if check_password(request.data['old_password'], request.user.password):
 			# change user password
 			request.user.set_password(request.data['new_password'])
-			request.user.save()
+			request.user.save(update_fields=['password', 'updated'])
 			return Response(status=status.HTTP_200_OK)
 		else:
 			# else return with error message and status code 400
@@ -361,28 +352,22 @@ class AccountViewSet(viewsets.ViewSet):
 		# 	return Response(status=status.HTTP_400_BAD_REQUEST)
 
 	def explore_friends(self, request):
-		def similarity_check_classrooms(user, other):
-			# return boolean whether they could be friends [based on the classroom list]
-			# if other.classrooms.all():
-			# 	print "this is not empty\n"
-			mine = set(user.classrooms.all())
-			his = set(other.classrooms.all())
-			return True if mine and his and (mine <= his or mine > his or len(mine & his) >= 2) else False
-
-		# def sharing_friends(user, other):
-		# 	# return boolean
-
-		possible_friends = []
-		# Explore Friends basing on classrooms
-		for account in self.queryset:
-			if account not in (request.user.friends.all() | request.user.pending_friends.all()) and request.user != account and similarity_check_classrooms(request.user, account):
-				possible_friends.append(account)
-		serializer = BasicAccountSerializer(possible_friends, many=True)
+		try:
+			page = max(int(request.query_params.get('page', 1)), 1)
+		except ValueError:
+			return Response(status=status.HTTP_400_BAD_REQUEST)
+
+		# Explore Friends basing on classrooms, ranked by shared classrooms and mutual friends
+		account_ids = get_recommendations(request.user, page)
+		sparse = get_sparse_fieldset(request)
+		accounts = BasicAccountSerializer.setup_eager_loading(self.queryset, **sparse).in_bulk(account_ids)
+		serializer = BasicAccountSerializer([accounts[pk] for pk in account_ids if pk in accounts], many=True, **sparse)
 		return Response(serializer.data)
 
 	@staticmethod
 	def pending_friends(request):
-		serializer = BasicAccountSerializer(request.user.pending_friends, many=True)
+		sparse = get_sparse_fieldset(request)
+		serializer = BasicAccountSerializer(BasicAccountSerializer.setup_eager_loading(request.user.pending_friends.all(), **sparse), many=True, **sparse)
 		return Response(serializer.data)
 
 	@staticmethod
@@ -391,59 +376,81 @@ class AccountViewSet(viewsets.ViewSet):
 
 		if request.method == 'GET':
 			classrooms = Classroom.objects.filter(students__pk=request.user.pk).order_by('major')
-			serializer = BasicClassroomSerializer(classrooms, many=True)
+			sparse = get_sparse_fieldset(request)
+			classrooms = BasicClassroomSerializer.setup_eager_loading(classrooms, **sparse)
+			serializer = BasicClassroomSerializer(classrooms, many=True, **sparse)
 			return Response(serializer.data)
 
+		if request.method == 'POST' and pk is None:
+			# join a list of classrooms at once, either all of them or none
+			classroom_ids = request.data.get('classrooms')
+			if not isinstance(classroom_ids, list) or not all(isinstance(classroom_id, int) for classroom_id in classroom_ids):
+				return Response({'detail': 'classrooms must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+			if classroom_queryset.filter(pk__in=classroom_ids).count() != len(set(classroom_ids)):
+				return Response({'detail': 'Classroom not found'}, status=status.HTTP_404_NOT_FOUND)
+			joined = enroll(request.user, classroom_ids)
+			conflicts = find_conflicts(request.user, joined)
+			return Response({'classrooms': joined, 'conflicts': dict((str(pk), conflicts[pk]) for pk in joined)}, status=status.HTTP_200_OK)
+
 		if request.method == 'POST':
 			classroom = get_object_or_404(classroom_queryset, pk=pk)
 			# add user to classroom student list
-			if request.user not in classroom.students.all():
-				classroom.students.add(request.user)
-				# add class time to user task list
-				classroom.class_time.involved.add(request.user)
-				# add classroom tasks from user task list
-				for task in classroom.tasks.all():
-					task.involved.add(request.user)
-
-				trigger_action(request.user, 'add_classroom')
+			if not Classroom.students.through.objects.filter(classroom_id=classroom.pk, account_id=request.user.pk).exists():
+				# adds the class time and classroom tasks to the user task list as well
+				enroll(request.user, [classroom.pk])
 
 				# add user to classroom chatrooms
 				# change into matrix version: classroom.chatrooms.get().accounts.add(request.user.username ???)
 				# also need to call the matrix api? add the user into matrix chatrooms...
 				# classroom.chatroom.get().accounts.add(request.user)
-				return Response(status=status.HTTP_200_OK)
+				# joining is never blocked, the client warns about clashes with the rest of the schedule
+				return Response({'conflicts': find_conflicts(request.user, [classroom.pk])[classroom.pk]}, status=status.HTTP_200_OK)
 			else:
 				return Response({'detail': 'Already in Classroom'}, status=status.HTTP_403_FORBIDDEN)
 
 		if request.method == 'DELETE':
 			classroom = get_object_or_404(classroom_queryset, pk=pk)
-			# remove user from classroom student list
-			classroom.students.remove(request.user)
-			# remove classroom time form user task list
-			classroom.class_time.involved.remove(request.user)
-			# remove classroom tasks from user task list
-			for task in classroom.tasks.all():
-				task.involved.remove(request.user)
+			# remove user from classroom student list, class time and classroom tasks
+			unenroll(request.user, [classroom.pk])
 			# remove user from classroom chatrooms
 			# classroom.chatroom.get().accounts.remove(request.user)
 			return Response(status=200)
 
+	@staticmethod
+	def conflicts(request, pk=None):
+		# GET classrooms/<pk>/conflicts/ checks one classroom, POST classrooms/conflicts/ a list of them, e.g. a search result
+		if pk:
+			get_object_or_404(Classroom.objects.all(), pk=pk)
+			return Response({'conflicts': find_conflicts(request.user, [int(pk)])[int(pk)]})
+
+		classroom_ids = request.data.get('classrooms')
+		if not isinstance(classroom_ids, list) or not all(isinstance(classroom_id, int) for classroom_id in classroom_ids):
+			return Response({'detail': 'classrooms must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+		conflicts = find_conflicts(request.user, classroom_ids)
+		return Response({'conflicts': dict((str(classroom_id), found) for classroom_id, found in conflicts.items())})
+
 	@staticmethod
 	def notes(request):
-		serializer = NoteSerializer(request.user.notes.all(), many=True)
+		sparse = get_sparse_fieldset(request)
+		serializer = NoteSerializer(NoteSerializer.setup_eager_loading(request.user.notes.all(), **sparse), many=True, **sparse)
 		return Response(serializer.data)
 
 	@staticmethod
-	def moments(request, moment_pk=None, account_pk=None):
-		if not account_pk:
+	def moments(request, moment_pk=None, pk=None):
+		if not pk:
 			moment_query_set = request.user.moments.filter(deleted=False).order_by('-created')
 		else:
-			moment_query_set = Account.objects.get(pk=account_pk).moments.filter(deleted=False).order_by('-created')
+			moment_query_set = get_object_or_404(Account.objects.all(), pk=pk).moments.filter(deleted=False).order_by('-created')
 
 		if request.method == 'GET':
-			# Only return first 20 moments
-			serializer = MomentSerializer(moment_query_set[0:20], many=True)
-			return Response(serializer.data)
+			sparse = get_sparse_fieldset(request)
+			moments = MomentSerializer.setup_eager_loading(moment_query_set, **sparse)
+			try:
+				moments, next_cursor = paginate_moments(moments, request.query_params.get('cursor'))
+			except ValueError:
+				return Response({'detail': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+			serializer = MomentSerializer(moments, many=True, **sparse)
+			return Response({'results': serializer.data, 'next': next_cursor})
 		elif request.method == 'POST':
 			content = request.data.get('content', None)
 			classroom_id = request.data.get('classroom_id', None)
@@ -480,9 +487,21 @@ class AccountViewSet(viewsets.ViewSet):
 		elif request.method == 'DELETE':
 			moment = get_object_or_404(moment_query_set, pk=moment_pk)
 			moment.deleted = True
-			moment.save()
+			moment.save(update_fields=['deleted', 'updated'])
 			return Response(status=status.HTTP_200_OK)
 
+	@staticmethod
+	def timeline(request):
+		# moments of the user's classrooms and friends, newest first
+		try:
+			moment_ids, next_cursor = get_timeline(request.user, request.query_params.get('cursor'))
+		except ValueError:
+			return Response({'detail': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+		sparse = get_sparse_fieldset(request)
+		moments = MomentSerializer.setup_eager_loading(Moment.objects.filter(pk__in=moment_ids), **sparse).order_by('-created', '-id')
+		serializer = MomentSerializer(moments, many=True, **sparse)
+		return Response({'results': serializer.data, 'next': next_cursor})
+
 	@staticmethod
 	def rooms(request, pk=None):
 		room_query_set = request.user.rooms.all()
@@ -504,7 +523,8 @@ class AccountViewSet(viewsets.ViewSet):
 	def tasks(request, pk=None):
 		task_queryset = request.user.tasks.all()
 		if request.method == 'GET':
-			serializer = TaskSerializer(task_queryset, many=True)
+			sparse = get_sparse_fieldset(request)
+			serializer = TaskSerializer(TaskSerializer.setup_eager_loading(task_queryset, **sparse), many=True, **sparse)
 			return Response(serializer.data)
 		elif request.method == 'POST':
 			serializer = TaskSerializer(data=request.data)
@@ -519,10 +539,7 @@ class AccountViewSet(viewsets.ViewSet):
 
 	@staticmethod
 	def study_plan(request):
-		user_tasks = request.user.tasks.all()
-		user = request.user
-		for task in user_tasks:
-			generate_recommendations_for_user(user, task)
+		generate_study_plan(request.user)
 		return Response(status=status.HTTP_200_OK)
 
 
@@ -532,8 +549,9 @@ class ProfessorViewSet(viewsets.ViewSet):
 	permission_classes = (IsAuthenticated,)
 
 	def retrieve(self, request, pk):
-		professor = get_object_or_404(self.queryset, pk=pk)
-		serializer = ProfessorSerializer(professor)
+		sparse = get_sparse_fieldset(request)
+		professor = get_object_or_404(ProfessorSerializer.setup_eager_loading(self.queryset, **sparse), pk=pk)
+		serializer = ProfessorSerializer(professor, **sparse)
 		return Response(serializer.data)
 
 	def update(self, request, pk):
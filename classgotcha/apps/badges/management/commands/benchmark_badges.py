@@ -0,0 +1,103 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ...models import Action, Badge, BadgeType
+from ...rules import bump_rules_version
+from ...script import apply_actions
+from ....accounts.models import Account
+from ....notifications.models import Notification
+
+
+class Rollback(Exception):
+	pass
+
+
+def legacy_trigger_action(account, action_name):
+	# trigger_action as it was before the set-based engine, one query per badge type and one save per badge
+	action = Action.objects.get(name=action_name)
+
+	linked_badge_types = action.linked_badge_types.all()
+	account_badges = account.badges.filter(finished=None)
+	account_badge_types = []
+
+	for account_badge in account_badges:
+		account_badge_types.append(account_badge.badge_type.name)
+		if account_badge.badge_type in linked_badge_types:
+			if not account_badge.finished:
+				account_badge.counter += 1
+			if account_badge.counter >= account_badge.badge_type.action_required:
+				account_badge.finished = timezone.now()
+				Notification.objects.create(receiver_id=account.id, content='You have achieved a new badge --- ' + account_badge.badge_type.name + '!')
+			account_badge.save()
+
+	for linked_badge_type in linked_badge_types:
+		if linked_badge_type.name not in account_badge_types:
+			new_ongoing_badge = Badge(account_id=account.id, badge_type=linked_badge_type)
+			if new_ongoing_badge.badge_type.action_required == 1:
+				new_ongoing_badge.finished = timezone.now()
+			new_ongoing_badge.save()
+
+	account.exp += action.exp
+	if account.exp >= 100:
+		account.level += 1
+		account.exp = 0
+		Notification.objects.create(receiver_id=account.id, content='Congratulation! You have reached Level %d!' % account.level)
+	account.save()
+
+
+class Command(BaseCommand):
+	help = 'Compare the set-based badge engine with the old trigger_action, all changes are rolled back'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--accounts', type=int, default=20)
+		parser.add_argument('--badge-types', type=int, default=45, help='Badge types linked to the action, all held by every account')
+		parser.add_argument('--actions', type=int, default=10, help='Actions triggered per account')
+
+	def run(self, label, calls, actions):
+		elapsed, queries = 0, 0
+		for call in calls:
+			# Captured one call at a time, connection.queries only keeps the last 9000
+			reset_queries()
+			with CaptureQueriesContext(connection) as captured:
+				started = time.time()
+				call()
+				elapsed += time.time() - started
+			queries += len(captured)
+		self.stdout.write('%-28s %8.2f ms/action %8.2f queries/action' % (label, elapsed * 1000 / actions, queries / float(actions)))
+
+	def handle(self, *args, **options):
+		prefix = 'benchmark-%s' % uuid.uuid4().hex[:8]
+		try:
+			with transaction.atomic():
+				action = Action.objects.create(name=prefix, exp=1)
+				badge_types = [BadgeType(name='%s-%d' % (prefix, i), identifier=prefix, action_required=10 ** 6)
+				               for i in range(options['badge_types'])]
+				BadgeType.objects.bulk_create(badge_types)
+				badge_types = list(BadgeType.objects.filter(identifier=prefix))
+				action.linked_badge_types.add(*badge_types)
+				Account.objects.bulk_create([Account(email='%s-%d@example.com' % (prefix, i), first_name='Benchmark', last_name=str(i))
+				                             for i in range(options['accounts'])])
+				accounts = list(Account.objects.filter(email__startswith=prefix + '-'))
+				Badge.objects.bulk_create([Badge(account_id=account.id, badge_type_id=badge_type.id, counter=0)
+				                           for account in accounts for badge_type in badge_types])
+				# The rules table has to see the uncommitted benchmark action
+				bump_rules_version()
+
+				events = [(account, prefix) for account in accounts for _ in range(options['actions'])]
+				self.stdout.write('%d accounts x %d badge types, %d actions' % (len(accounts), len(badge_types), len(events)))
+
+				self.run('legacy trigger_action', [lambda account=account, name=name: legacy_trigger_action(account, name)
+				                                   for account, name in events], len(events))
+				self.run('set-based, one per action', [lambda account=account, name=name: apply_actions([(account.id, name)])
+				                                       for account, name in events], len(events))
+				self.run('set-based, one batch', [lambda: apply_actions([(account.id, name) for account, name in events])], len(events))
+				raise Rollback
+		except Rollback:
+			pass
+		finally:
+			bump_rules_version()
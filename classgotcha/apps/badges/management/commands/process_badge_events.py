@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ...models import ActionEvent
+from ...script import process_events
+
+
+def close_connections():
+	# Forked workers must not reuse the parent's database connection
+	connections.close_all()
+
+
+def split_by_account(events, parts):
+	"""Split events into parts that never share an account, keeping each account's events in order."""
+	accounts = OrderedDict()
+	for event in events:
+		accounts.setdefault(event[1], []).append(event)
+	chunks = [[] for _ in range(parts)]
+	for i, account_events in enumerate(accounts.values()):
+		chunks[i % parts] += account_events
+	return [chunk for chunk in chunks if chunk]
+
+
+class Command(BaseCommand):
+	help = 'Apply queued badge and EXP events (trigger_action with BADGE_EVENTS_ASYNC) in batches'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--workers', type=int, default=cpu_count(), help='Number of worker processes, 1 runs inline')
+		parser.add_argument('--batch-size', type=int, default=1000, help='Events read from the queue per round')
+		parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+		parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+	def handle(self, *args, **options):
+		workers = options['workers']
+		pool = None
+		if workers > 1:
+			close_connections()
+			pool = Pool(workers, initializer=close_connections)
+
+		started = time.time()
+		done = 0
+		try:
+			while True:
+				# Only this process reads the queue, so a round never races another one for the same account
+				events = list(ActionEvent.objects.order_by('pk').values_list('pk', 'account_id', 'action')[:options['batch_size']])
+				if not events:
+					if options['once']:
+						break
+					time.sleep(options['interval'])
+					continue
+
+				chunks = split_by_account(events, workers)
+				done += sum(pool.map(process_events, chunks) if pool else map(process_events, chunks))
+				self.stdout.write('%d events (%.1f events/sec)' % (done, done / max(time.time() - started, 1e-6)))
+		except BaseException:
+			if pool:
+				pool.terminate()
+			raise
+		if pool:
+			pool.close()
+			pool.join()
+		self.stdout.write('Applied %d events' % done)
@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rules import bump_rules_version
 
 
 class Action(models.Model):
@@ -37,3 +41,23 @@ class Badge(models.Model):
 		return self.badge_type.name + '-' + self.account.email
 
 
+
+
+class ActionEvent(models.Model):
+	# Queued trigger_action call, applied and deleted by process_badge_events
+	account = models.ForeignKey('accounts.Account', related_name='action_events', on_delete=models.CASCADE)
+	action = models.CharField(max_length=200)
+	created = models.DateTimeField(auto_now_add=True)
+
+	def __unicode__(self):
+		return self.action
+
+
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=BadgeType)
+@receiver(post_delete, sender=BadgeType)
+@receiver(m2m_changed, sender=BadgeType.linked_actions.through)
+def rules_changed(sender, **kwargs):
+	# After commit, so that no process compiles the new version from uncommitted rows
+	transaction.on_commit(bump_rules_version)
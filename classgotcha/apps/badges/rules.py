@@ -0,0 +1,49 @@
+import uuid
+
+from django.core.cache import cache
+
+RULES_VERSION_KEY = 'badges:rules_version'
+RULES_TABLE_KEY = 'badges:rules:%s'
+
+# Compiled table of this process, reloaded once the shared version moves
+_compiled = {'version': '', 'rules': {}}
+
+
+def bump_rules_version():
+	"""Invalidate the compiled rule table of every process, called when actions or badge types change."""
+	cache.set(RULES_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def compile_rules():
+	"""{action name: (exp, [{'id', 'name', 'action_required'}])} for every action."""
+	# models imports this module for its receivers
+	from models import Action, BadgeType
+
+	rules = dict((name, (exp, [])) for name, exp in Action.objects.values_list('name', 'exp'))
+	badge_types = BadgeType.objects.filter(linked_actions__isnull=False).order_by('pk') \
+		.values('id', 'name', 'action_required', 'linked_actions__name')
+	for badge_type in badge_types:
+		rules[badge_type.pop('linked_actions__name')][1].append(badge_type)
+	return rules
+
+
+def get_rules():
+	"""
+	Return the compiled rule table, it costs a single cache read while the table is current.
+
+	After a change the first process to notice compiles the table and shares it
+	through the cache under the new version, the others load it from there.
+	"""
+	version = cache.get(RULES_VERSION_KEY)
+	if version is None:
+		# add() so that processes racing after a cache flush settle on one version
+		cache.add(RULES_VERSION_KEY, uuid.uuid4().hex, None)
+		version = cache.get(RULES_VERSION_KEY)
+
+	if _compiled['version'] != version:
+		rules = cache.get(RULES_TABLE_KEY % version)
+		if rules is None:
+			rules = compile_rules()
+			cache.set(RULES_TABLE_KEY % version, rules, None)
+		_compiled['version'], _compiled['rules'] = version, rules
+	return _compiled['rules']
@@ -1,56 +1,149 @@
-from django.shortcuts import get_object_or_404
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.db.models.functions import Least
 from django.utils import timezone
 
-from models import Action, Badge
-from ..notifications.models import Notification
+from models import ActionEvent, Badge
+from rules import get_rules
+from ..accounts.models import Account
+from ..classrooms.upserts import bulk_update, UPSERT_BATCH_SIZE
+from ..notifications.dispatch import notify_many
+
+LEVEL_UP_EXP = 100
+
+
+def level_up(exp, level, gained):
+	"""Return (exp, level, leveled) after gaining exp, reaching a level resets exp to 0."""
+	exp += gained
+	if exp >= LEVEL_UP_EXP:
+		return 0, level + 1, True
+	return exp, level, False
+
+
+def chunked(changes, size=UPSERT_BATCH_SIZE):
+	pks = list(changes)
+	for start in range(0, len(pks), size):
+		yield dict((pk, changes[pk]) for pk in pks[start:start + size])
+
+
+def progress_badges(account_ids, badge_types, count=1, now=None):
+	"""
+	Count `count` actions towards badge_types for every account, in set form.
+
+	One SELECT finds the badges about to finish and the missing ones, one conditional
+	UPDATE advances every unfinished badge and finishes the ones picked by the SELECT and one bulk_create adds the missing badges.
+	Returns the newly finished badges as [(account_id, badge type dict)].
+	"""
+	if not account_ids or not badge_types:
+		return []
+	now = now or timezone.now()
+	badge_types = dict((badge_type['id'], badge_type) for badge_type in badge_types)
+
+	held = Badge.objects.filter(account_id__in=account_ids, badge_type_id__in=list(badge_types))
+	existing, finished, finishing = set(), [], []
+	for pk, account_id, badge_type_id, counter, finished_at in held.values_list('pk', 'account_id', 'badge_type_id', 'counter', 'finished'):
+		existing.add((account_id, badge_type_id))
+		if finished_at is None and counter + count >= badge_types[badge_type_id]['action_required']:
+			finished.append((account_id, badge_types[badge_type_id]))
+			finishing.append(pk)
+
+	# One WHEN per threshold rather than per badge type keeps the statement small.
+	# Counters stop at action_required, as they did when badges were advanced one action at a time
+	thresholds = defaultdict(list)
+	for pk, badge_type in badge_types.items():
+		thresholds[badge_type['action_required']].append(pk)
+	# finished is set on the rows picked by the SELECT above, not from counter, which MySQL may
+	# already have advanced when it evaluates the next assignment of the same UPDATE
+	held.filter(finished=None).update(
+		counter=Case(*[When(badge_type_id__in=pks, then=Least(F('counter') + count, Value(required)))
+		               for required, pks in thresholds.items()], output_field=IntegerField()),
+		finished=Case(When(pk__in=finishing, then=Value(now)), default=None, output_field=DateTimeField()),
+	)
 
+	new_badges = []
+	for account_id in account_ids:
+		for pk, badge_type in badge_types.items():
+			if (account_id, pk) in existing:
+				continue
+			badge = Badge(account_id=account_id, badge_type_id=pk, counter=min(count, badge_type['action_required']))
+			if count >= badge_type['action_required']:
+				badge.finished = now
+				finished.append((account_id, badge_type))
+			new_badges.append(badge)
+	Badge.objects.bulk_create(new_badges)
+	return finished
 
-def level_up(account, exp):
-	level_up_exp = 100
-	account.exp += exp
-	if account.exp >= level_up_exp:
-		account.level += 1
-		account.exp = 0
-		notification = Notification(receiver_id=account.id)
-		notification.content = 'Congratulation! You have reached Level %d!' % account.level
-		notification.save()
-	account.save()
+
+def apply_actions(events):
+	"""
+	Apply [(account_id, action name)] events, unknown actions are ignored.
+
+	Events are coalesced into (action, count) groups of accounts, each group advances its
+	badges with progress_badges. EXP is replayed in order because a level up resets it.
+	Returns {account_id: (exp, level)} of the changed accounts.
+	"""
+	rules = get_rules()
+	events = [(account_id, name) for account_id, name in events if name in rules]
+	if not events:
+		return {}
+	now = timezone.now()
+
+	with transaction.atomic():
+		# Row locks serialize concurrent updates of the same accounts' badges
+		accounts = dict((pk, (exp, level)) for pk, exp, level in
+		                Account.objects.select_for_update().filter(pk__in=set(account_id for account_id, name in events))
+		                .values_list('pk', 'exp', 'level'))
+		events = [(account_id, name) for account_id, name in events if account_id in accounts]
+
+		groups = defaultdict(list)
+		for (account_id, name), count in Counter(events).items():
+			groups[name, count].append(account_id)
+		finished = []
+		for (name, count), account_ids in groups.items():
+			finished += progress_badges(account_ids, rules[name][1], count, now)
+		notifications = [(account_id, None, 'You have achieved a new badge --- ' + badge_type['name'] + '!')
+		                 for account_id, badge_type in finished]
+
+		changed_accounts = {}
+		for account_id, name in events:
+			exp, level, leveled = level_up(accounts[account_id][0], accounts[account_id][1], rules[name][0])
+			accounts[account_id] = changed_accounts[account_id] = exp, level
+			if leveled:
+				notifications.append((account_id, None, 'Congratulation! You have reached Level %d!' % level))
+
+		for changes in chunked(dict((pk, {'exp': exp, 'level': level}) for pk, (exp, level) in changed_accounts.items())):
+			bulk_update(Account, changes)
+		notify_many(notifications)
+	return changed_accounts
+
+
+def trigger_actions(events):
+	"""
+	Record [(account, action name)] events.
+
+	With BADGE_EVENTS_ASYNC they are queued with a single insert and applied later by
+	process_badge_events, otherwise they are applied right away.
+	"""
+	if getattr(settings, 'BADGE_EVENTS_ASYNC', False):
+		ActionEvent.objects.bulk_create([ActionEvent(account_id=account.id, action=name) for account, name in events])
+	else:
+		changed_accounts = apply_actions([(account.id, name) for account, name in events])
+		# keep the caller's instances current, a later save() must not write back the old EXP
+		for account, name in events:
+			if account.id in changed_accounts:
+				account.exp, account.level = changed_accounts[account.id]
 
 
 def trigger_action(account, action_name):
-	action = get_object_or_404(Action.objects.all(), name=action_name)
-
-	linked_badge_types = action.linked_badge_types.all()
-	account_badges = account.badges.filter(finished=None)
-	account_badge_types = []
-
-	for account_badge in account_badges:
-		# save account badge types for later
-		account_badge_types.append(account_badge.badge_type.name)
-		# add counter to all linked badges
-		if account_badge.badge_type in linked_badge_types:
-			# Add counter for unfinished
-			if not account_badge.finished:
-				account_badge.counter += 1
-
-			# Finish badge
-			if account_badge.counter >= account_badge.badge_type.action_required:
-				account_badge.finished = timezone.now()
-				# Send notification
-				notification = Notification(receiver_id=account.id)
-				notification.content = 'You have achieved a new badge --- ' + account_badge.badge_type.name + '!'
-				notification.save()
-
-			account_badge.save()
-
-	# New badge
-	for linked_badge_type in linked_badge_types:
-		if linked_badge_type.name not in account_badge_types:
-			new_ongoing_badge = Badge(account_id=account.id, badge_type=linked_badge_type)
-
-			if new_ongoing_badge.badge_type.action_required == 1:
-				new_ongoing_badge.finished = timezone.now()
-
-			new_ongoing_badge.save()
-
-	level_up(account, action.exp)
+	trigger_actions([(account, action_name)])
+
+
+def process_events(events):
+	"""Apply queued (event id, account_id, action name) rows and delete them in the same transaction."""
+	with transaction.atomic():
+		apply_actions([(account_id, name) for pk, account_id, name in events])
+		ActionEvent.objects.filter(pk__in=[pk for pk, account_id, name in events]).delete()
+	return len(events)
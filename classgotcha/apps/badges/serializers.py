@@ -1,15 +1,16 @@
 from rest_framework import serializers
 
 from models import BadgeType, Badge
+from ..mixins import EagerLoadingMixin
 
 
-class BadgeTypeSerializer(serializers.ModelSerializer):
+class BadgeTypeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class Meta:
 		model = BadgeType
 		fields = ('name', 'action_required', 'description', 'level', 'identifier')
 
 
-class BadgeSerializer(serializers.ModelSerializer):
+class BadgeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	badge_type = BadgeTypeSerializer()
 
 	class Meta:
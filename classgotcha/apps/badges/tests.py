@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from models import Badge, BadgeType
+from script import progress_badges
+from ..accounts.models import Account
+
+
+class ProgressBadgesTest(TestCase):
+	def setUp(self):
+		self.badge_type = BadgeType.objects.create(name='Helper', action_required=3)
+		self.rule = {'id': self.badge_type.id, 'name': 'Helper', 'action_required': 3}
+		self.now = timezone.now()
+		self.count = 0
+
+	def badge(self, counter, finished=None):
+		self.count += 1
+		account = Account.objects.create(email='student%d@psu.edu' % self.count)
+		Badge.objects.create(account=account, badge_type=self.badge_type, counter=counter, finished=finished)
+		return account.id
+
+	def progress(self, account_ids, count):
+		finished = progress_badges(account_ids, [self.rule], count, self.now)
+		badges = dict((account_id, (counter, finished_at)) for account_id, counter, finished_at in
+		              Badge.objects.filter(account_id__in=account_ids).values_list('account_id', 'counter', 'finished'))
+		return sorted(account_id for account_id, badge_type in finished), badges
+
+	def test_one_step(self):
+		before, at, capped = self.badge(1), self.badge(2), self.badge(3)
+		finished, badges = self.progress([before, at, capped], 1)
+		self.assertEqual(finished, sorted([at, capped]))
+		self.assertEqual(badges[before], (2, None))
+		self.assertEqual(badges[at], (3, self.now))
+		self.assertEqual(badges[capped], (3, self.now))
+
+	def test_overshoot(self):
+		short, over = self.badge(0), self.badge(2)
+		finished, badges = self.progress([short, over], 2)
+		self.assertEqual(finished, [over])
+		self.assertEqual(badges[short], (2, None))
+		self.assertEqual(badges[over], (3, self.now))
+
+	def test_finished_badges_are_left_alone(self):
+		earlier = self.now - timedelta(days=1)
+		done = self.badge(3, earlier)
+		finished, badges = self.progress([done], 1)
+		self.assertEqual(finished, [])
+		self.assertEqual(badges[done], (3, earlier))
+
+	def test_missing_badges(self):
+		before, over = Account.objects.create(email='before@psu.edu').id, Account.objects.create(email='over@psu.edu').id
+		self.assertEqual(self.progress([before], 2), ([], {before: (2, None)}))
+		self.assertEqual(self.progress([over], 5), ([over], {over: (3, self.now)}))
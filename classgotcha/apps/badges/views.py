@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from models import Action, BadgeType
+from rules import bump_rules_version
 
 
 @api_view(['GET'])
@@ -190,4 +191,6 @@ def action_init(request):
 	BadgeType.objects.get(name='Community Contributor IV').linked_actions.add(report_forum, report_user, report_post, report_classroom_task)
 	BadgeType.objects.get(name='Community Contributor V').linked_actions.add(report_forum, report_user, report_post, report_classroom_task)
 
+	# bulk_create sends no post_save
+	bump_rules_version()
 	return Response({'detail': 'Done'}, status=status.HTTP_201_CREATED)
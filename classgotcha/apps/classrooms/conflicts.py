@@ -0,0 +1,83 @@
+from bisect import bisect_left
+
+from django.utils import timezone
+
+from models import Classroom
+from ..tasks.models import Task
+from ..tasks.recurrence import MASK_WEEKDAYS
+
+
+def minutes(value):
+	value = timezone.localtime(value) if timezone.is_aware(value) else value
+	return value.hour * 60 + value.minute
+
+
+class ScheduleIndex(object):
+	"""
+	Weekly class times and office hours of one account, as a sorted interval array per weekday.
+
+	Entries of a day are sorted by start with a running maximum of their ends, so an
+	overlap query is a binary search followed by a scan of the actual overlaps only.
+	"""
+
+	def __init__(self, tasks):
+		days = [[] for _ in range(7)]
+		for task in tasks:
+			if task.start and task.end and minutes(task.start) < minutes(task.end):
+				for weekday in MASK_WEEKDAYS[task.weekdays]:
+					days[weekday].append((minutes(task.start), minutes(task.end), task))
+
+		self.days = []
+		for entries in days:
+			entries.sort(key=lambda entry: entry[:2])
+			max_ends, latest = [], 0
+			for start, end, task in entries:
+				latest = max(latest, end)
+				max_ends.append(latest)
+			self.days.append(([entry[0] for entry in entries], max_ends, entries))
+
+	@classmethod
+	def for_account(cls, account):
+		# one query for every recurring class time and office hour of the account
+		return cls(account.tasks.filter(category__in=(Task.CLASS, Task.OFFICE_HOUR), weekdays__gt=0)
+		           .select_related('classroom').only('task_name', 'category', 'start', 'end', 'weekdays', 'classroom__semester_id'))
+
+	def overlapping(self, weekdays, start, end):
+		"""Yield (weekday, task) for every entry overlapping start-end (minutes of the day) on the given weekdays."""
+		for weekday in MASK_WEEKDAYS[weekdays]:
+			starts, max_ends, entries = self.days[weekday]
+			i = bisect_left(starts, end) - 1
+			while i >= 0 and max_ends[i] > start:
+				if entries[i][1] > start:
+					yield weekday, entries[i][2]
+				i -= 1
+
+	def conflicts(self, class_time, semester_id=None):
+		"""Class times and office hours clashing with class_time, classes of other semesters never clash."""
+		if not class_time or not class_time.start or not class_time.end:
+			return []
+		found = {}
+		for weekday, task in self.overlapping(class_time.weekdays, minutes(class_time.start), minutes(class_time.end)):
+			if task.id == class_time.id:
+				continue
+			classroom = getattr(task, 'classroom', None)
+			if classroom and semester_id and classroom.semester_id != semester_id:
+				continue
+			conflict = found.setdefault(task.id, {
+				'task': task.id,
+				'task_name': task.task_name,
+				'classroom': classroom.id if classroom else None,
+				'repeat_list': [],
+			})
+			conflict['repeat_list'].append(weekday + 1)
+		for conflict in found.values():
+			conflict['repeat_list'].sort()
+		return sorted(found.values(), key=lambda conflict: conflict['task'])
+
+
+def find_conflicts(account, classroom_ids):
+	"""{classroom id: [conflict]} for the given classrooms against the account's schedule, in two queries."""
+	index = ScheduleIndex.for_account(account)
+	classrooms = Classroom.objects.filter(pk__in=classroom_ids).select_related('class_time') \
+		.only('semester_id', 'class_time__start', 'class_time__end', 'class_time__weekdays')
+	return dict((classroom.id, index.conflicts(classroom.class_time, classroom.semester_id)) for classroom in classrooms)
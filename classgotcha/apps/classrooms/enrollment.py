@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models import F
+
+from models import Classroom
+from roster import touch_rosters
+from ..accounts.models import Account
+from ..accounts.recommendations import classrooms_changed
+from ..badges.script import trigger_actions
+from ..tasks.ical import touch_calendar
+from ..tasks.models import Task
+
+ClassroomStudent = Classroom.students.through
+TaskInvolved = Task.involved.through
+
+
+def classroom_task_ids(classroom_ids):
+	"""Class times and tasks of the classrooms, the tasks a student of them is involved in."""
+	task_ids = set(Task.objects.filter(task_of_classroom_id__in=classroom_ids).values_list('id', flat=True))
+	task_ids.update(Classroom.objects.filter(pk__in=classroom_ids, class_time__isnull=False).values_list('class_time_id', flat=True))
+	return task_ids
+
+
+def enroll(account, classroom_ids):
+	"""
+	Add the account to every classroom it isn't a student of yet, all or nothing.
+
+	Writes the student rows and the involved rows of all their tasks with one bulk_create
+	each, whatever the number of classrooms and tasks. Returns the ids of the classrooms joined.
+	"""
+	with transaction.atomic():
+		# Locking the account serializes concurrent enrollments of the same student
+		Account.objects.select_for_update().filter(pk=account.id).exists()
+		joined = ClassroomStudent.objects.filter(account_id=account.id, classroom_id__in=classroom_ids).values_list('classroom_id', flat=True)
+		new_ids = list(Classroom.objects.filter(pk__in=classroom_ids).exclude(pk__in=list(joined)).values_list('id', flat=True))
+		if not new_ids:
+			return []
+
+		ClassroomStudent.objects.bulk_create([ClassroomStudent(classroom_id=pk, account_id=account.id) for pk in new_ids])
+		Classroom.objects.filter(pk__in=new_ids).update(students_count=F('students_count') + 1)
+		task_ids = classroom_task_ids(new_ids)
+		task_ids.difference_update(TaskInvolved.objects.filter(account_id=account.id, task_id__in=task_ids).values_list('task_id', flat=True))
+		TaskInvolved.objects.bulk_create([TaskInvolved(task_id=pk, account_id=account.id) for pk in task_ids])
+
+		trigger_actions([(account, 'add_classroom')] * len(new_ids))
+		# bulk_create sends no m2m_changed
+		transaction.on_commit(lambda: touch_rosters(*new_ids))
+	touch_calendar(account.id)
+	classrooms_changed(account, new_ids)
+	return new_ids
+
+
+def unenroll(account, classroom_ids):
+	"""Remove the account from the classrooms and their tasks, returns the ids of the classrooms left."""
+	with transaction.atomic():
+		Account.objects.select_for_update().filter(pk=account.id).exists()
+		students = ClassroomStudent.objects.filter(account_id=account.id, classroom_id__in=classroom_ids)
+		left_ids = list(students.values_list('classroom_id', flat=True))
+		students.delete()
+		# only classrooms whose student row was actually deleted lose a student, so the counter can't drift
+		Classroom.objects.filter(pk__in=left_ids).update(students_count=F('students_count') - 1)
+		TaskInvolved.objects.filter(account_id=account.id, task_id__in=classroom_task_ids(classroom_ids)).delete()
+		transaction.on_commit(lambda: touch_rosters(*left_ids))
+	touch_calendar(account.id)
+	classrooms_changed(account, classroom_ids)
+	return left_ids
@@ -0,0 +1,193 @@
+import codecs
+import datetime
+import json
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from models import Classroom, Major, Professor
+from search import update_search_index
+from upserts import upsert_professors
+from ..typeahead import classroom_typeahead
+from ..tasks.models import Task
+from ..tasks.recurrence import weekday_mask
+
+IMPORT_BATCH_SIZE = 500
+
+
+def iter_json_array(fp, chunk_size=64 * 1024):
+	"""
+	Yield the items of a top-level JSON array one by one.
+
+	The file is read and decoded chunk by chunk, so only the current item
+	has to fit in memory instead of the whole upload.
+	"""
+	decoder = json.JSONDecoder()
+	utf8 = codecs.getincrementaldecoder('utf-8')()
+	buf, eof, started = u'', False, False
+	need_more = False
+
+	while True:
+		buf = buf.lstrip()
+		if not eof and (need_more or len(buf) < chunk_size):
+			data = fp.read(chunk_size)
+			eof = not data
+			buf += utf8.decode(data, final=eof)
+			need_more = False
+			continue
+
+		if not started:
+			if not buf.startswith('['):
+				raise ValueError('Expected a JSON array')
+			buf, started = buf[1:], True
+		elif buf.startswith(']'):
+			return
+		elif buf.startswith(','):
+			buf = buf[1:]
+		elif not buf:
+			raise ValueError('Unexpected end of JSON array')
+		else:
+			try:
+				item, end = decoder.raw_decode(buf)
+			except ValueError:
+				# Item is cut off at the end of the buffer
+				if eof:
+					raise
+				need_more = True
+				continue
+			if not eof and buf[end:].lstrip()[:1] not in (',', ']'):
+				# A number could continue in the next chunk, decode it again with more data
+				need_more = True
+				continue
+			yield item
+			buf = buf[end:]
+
+
+def parse_name(name):
+	name = name.upper().replace(',', '').split()
+	return name[0], name[1]
+
+
+def parse_course(course):
+	"""Turn one catalog row into the values the importer writes, raises on malformed rows."""
+	major_short, class_number = course['course_short_name'].split()[0:2]
+	parsed = {
+		'major_short': major_short,
+		'class_code': course['class_number'],
+		'class_number': class_number,
+		'class_name': course['course_full_name'],
+		'description': course['course_description'],
+		'class_section': course['course_section'],
+		'class_credit': course['course_credit'],
+		'class_location': course['room'],
+		'task_name': course['course_short_name'] + ' - ' + course['course_section'],
+		'repeat': '',
+		'start': None,
+		'end': None,
+		'professors': [parse_name(course[key]) for key in ('instructor1', 'instructor2') if key in course],
+	}
+	class_time = course['datetime'].split()
+	if len(class_time) == 4:
+		parsed['repeat'] = class_time[0]
+		parsed['start'] = datetime.datetime.strptime(class_time[1], '%I:%M%p')
+		parsed['end'] = datetime.datetime.strptime(class_time[3], '%I:%M%p')
+	return parsed
+
+
+def import_course_batch(batch, semester, major_ids, report):
+	courses = []
+	for row, parsed in batch:
+		if parsed['major_short'] not in major_ids:
+			report['errors'].append({'row': row, 'class_code': parsed['class_code'], 'error': 'Unknown major %s' % parsed['major_short']})
+		else:
+			courses.append((row, parsed))
+
+	class_codes = [parsed['class_code'] for row, parsed in courses]
+	existing = set(Classroom.objects.filter(class_code__in=class_codes).values_list('class_code', flat=True))
+	for row, parsed in courses:
+		if parsed['class_code'] in existing:
+			report['errors'].append({'row': row, 'class_code': parsed['class_code'], 'error': 'Classroom already exists'})
+	courses = [(row, parsed) for row, parsed in courses if parsed['class_code'] not in existing]
+	if not courses:
+		return
+
+	try:
+		with transaction.atomic():
+			names = set(name for row, parsed in courses for name in parsed['professors'])
+			professor_ids = upsert_professors([{'first_name': first_name, 'last_name': last_name} for first_name, last_name in names])['ids']
+
+			# bulk_create doesn't return ids on MySQL, so class times are tagged to find them again
+			marker = uuid.uuid4().hex
+			Task.objects.bulk_create([
+				Task(task_name=parsed['task_name'], location=parsed['class_location'], type=Task.EVENT, category=Task.CLASS,
+				     repeat=parsed['repeat'], weekdays=weekday_mask(parsed['repeat']), start=parsed['start'], end=parsed['end'],
+				     description='%s:%s' % (marker, parsed['class_code']))
+				for row, parsed in courses
+			])
+			class_times = Task.objects.filter(description__startswith=marker + ':')
+			class_time_ids = dict((description.split(':', 1)[1], pk) for pk, description in class_times.values_list('pk', 'description'))
+			class_times.update(description=None)
+
+			Classroom.objects.bulk_create([
+				Classroom(class_code=parsed['class_code'], class_number=parsed['class_number'], class_name=parsed['class_name'],
+				          description=parsed['description'], class_section=parsed['class_section'],
+				          class_credit=parsed['class_credit'], class_location=parsed['class_location'],
+				          class_time_id=class_time_ids[parsed['class_code']], major_id=major_ids[parsed['major_short']],
+				          semester=semester)
+				for row, parsed in courses
+			])
+			classroom_ids = dict(Classroom.objects.filter(class_code__in=class_codes).values_list('class_code', 'pk'))
+
+			ClassroomProfessor = Classroom.professors.through
+			ClassroomProfessor.objects.bulk_create([
+				ClassroomProfessor(classroom_id=classroom_ids[parsed['class_code']],
+				                   professor_id=professor_ids[Professor.make_name_key(*name)])
+				for row, parsed in courses for name in set(parsed['professors'])
+			])
+	except IntegrityError as e:
+		for row, parsed in courses:
+			report['errors'].append({'row': row, 'class_code': parsed['class_code'], 'error': 'Batch failed: %s' % e})
+	else:
+		report['created'] += len(courses)
+		# bulk_create sends no post_save
+		classroom_ids = list(classroom_ids.values())
+		transaction.on_commit(lambda: update_search_index(classroom_ids))
+		transaction.on_commit(lambda: classroom_typeahead.update(classroom_ids))
+
+
+def import_courses(fp, semester, batch_size=IMPORT_BATCH_SIZE):
+	"""
+	Import a course catalog (a JSON array of course rows) into the given semester.
+
+	Majors are preloaded into a dictionary and professors upserted once per batch,
+	every batch is written with bulk_create inside its own transaction. Rows that can't be imported are reported
+	as {'row', 'class_code', 'error'} entries instead of aborting the import.
+	"""
+	report = {'created': 0, 'errors': []}
+	major_ids = dict(Major.objects.values_list('major_short', 'pk'))
+	seen = set()
+	batch = []
+	row = 0
+
+	try:
+		for row, course in enumerate(iter_json_array(fp)):
+			try:
+				parsed = parse_course(course)
+			except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+				report['errors'].append({'row': row, 'class_code': None, 'error': 'Malformed course: %r' % e})
+				continue
+			if parsed['class_code'] in seen:
+				report['errors'].append({'row': row, 'class_code': parsed['class_code'], 'error': 'Duplicate class code in upload'})
+				continue
+			seen.add(parsed['class_code'])
+
+			batch.append((row, parsed))
+			if len(batch) >= batch_size:
+				import_course_batch(batch, semester, major_ids, report)
+				batch = []
+	except ValueError as e:
+		report['errors'].append({'row': row, 'class_code': None, 'error': 'Invalid JSON: %s' % e})
+
+	if batch:
+		import_course_batch(batch, semester, major_ids, report)
+	return report
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from ...models import Semester
+from ...importers import import_courses, IMPORT_BATCH_SIZE
+
+
+def parse_date(value):
+	return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+	help = 'Import a course catalog JSON file, same format as classroom/course-upload/'
+
+	def add_arguments(self, parser):
+		parser.add_argument('file', help='JSON array of course rows')
+		parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows written per transaction')
+		parser.add_argument('--semester', default='Fall 2017')
+		parser.add_argument('--semester-start', type=parse_date, default=parse_date('2017-08-21'))
+		parser.add_argument('--semester-end', type=parse_date, default=parse_date('2017-12-08'))
+
+	def handle(self, *args, **options):
+		semester, created = Semester.objects.get_or_create(name=options['semester'], start=options['semester_start'], end=options['semester_end'])
+
+		with open(options['file'], 'rb') as f:
+			report = import_courses(f, semester, batch_size=options['batch_size'])
+
+		for error in report['errors']:
+			self.stderr.write('row %(row)s (%(class_code)s): %(error)s' % error)
+		self.stdout.write('Imported %d courses, %d rows failed' % (report['created'], len(report['errors'])))
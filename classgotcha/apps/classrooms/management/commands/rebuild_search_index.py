@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+	help = 'Rebuild the classroom search index from scratch, the other processes pick it up on their next search'
+
+	def handle(self, *args, **options):
+		started = time.time()
+		indexed = get_search_backend().rebuild()
+		self.stdout.write('Indexed %d classrooms in %.1fs' % (indexed, time.time() - started))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from ...models import Classroom
+from ...upserts import bulk_update, UPSERT_BATCH_SIZE
+from ....posts.models import Moment, Post, Comment
+
+
+def count_by(queryset, key):
+	return dict(queryset.order_by().values(key).annotate(count=Count('pk')).values_list(key, 'count'))
+
+
+def reconcile(model, field, counts, batch_size):
+	"""Overwrite the stored counter of every row that differs from counts, returns how many were fixed."""
+	changes = {}
+	for pk, stored in model.objects.values_list('pk', field).iterator():
+		actual = counts.get(pk, 0)
+		if stored != actual:
+			changes[pk] = {field: actual}
+
+	pks = list(changes)
+	for start in range(0, len(pks), batch_size):
+		bulk_update(model, dict((pk, changes[pk]) for pk in pks[start:start + batch_size]))
+	return len(changes)
+
+
+class Command(BaseCommand):
+	help = 'Recount the denormalized students_count, likes and comments_count counters and fix drifted rows'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=UPSERT_BATCH_SIZE, help='Rows fixed per UPDATE')
+
+	def handle(self, *args, **options):
+		counters = [
+			(Classroom, 'students_count', count_by(Classroom.students.through.objects, 'classroom_id')),
+			(Moment, 'likes', count_by(Moment.liked_users.through.objects, 'moment_id')),
+			(Post, 'comments_count', count_by(Comment.objects.filter(post__isnull=False), 'post_id')),
+		]
+		for model, field, counts in counters:
+			fixed = reconcile(model, field, counts, options['batch_size'])
+			self.stdout.write('%s.%s: fixed %d rows' % (model.__name__, field, fixed))
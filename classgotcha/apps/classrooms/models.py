@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 from ..accounts.models import Account, Professor
 from ..tags.models import Tag
+from roster import ROSTER_ACCOUNT_FIELDS, touch_rosters
+from search import update_search_index
+from ..typeahead import classroom_typeahead
 
 
 class Major(models.Model):
@@ -47,9 +53,12 @@ class Classroom(models.Model):
 	class_location = models.CharField(max_length=50)
 	syllabus = models.FileField(upload_to='class_syllabus', blank=True, null=True)
 	description = models.TextField(blank=True)
+	# Counters, kept in sync with F() updates, see reconcile_counters
+	students_count = models.IntegerField(default=0)
 	# Timestamp
 	created = models.DateField(auto_now_add=True)
-	updated = models.DateTimeField(auto_now=True)
+	# Indexed for the search and typeahead indexes catching up on the classrooms changed since their last sync
+	updated = models.DateTimeField(auto_now=True, db_index=True)
 	# Relations
 	class_time = models.OneToOneField('tasks.Task', related_name='classroom', null=True)
 	professors = models.ManyToManyField(Professor, related_name='classrooms')
@@ -68,10 +77,6 @@ class Classroom(models.Model):
 	def __unicode__(self):
 		return self.class_short
 
-	@property
-	def students_count(self):
-		return len(self.students.all())
-
 	@property
 	def class_short(self):
 		return self.major.major_short + ' ' + self.class_number
@@ -90,3 +95,61 @@ class OfficeHour(models.Model):
 	classroom = models.ForeignKey(Classroom, related_name='office_hours')
 	time = models.ForeignKey('tasks.Task', related_name='office_hour')
 
+
+def classrooms_edited(classroom_ids):
+	# Classroom.updated tells the search index of every other process what to catch up on
+	Classroom.objects.filter(pk__in=classroom_ids).update(updated=timezone.now())
+	transaction.on_commit(lambda: update_search_index(classroom_ids))
+
+
+# Classroom fields the search index and the typeahead read, saves of other fields leave both alone
+INDEXED_FIELDS = ('class_name', 'class_number', 'class_code', 'description', 'major')
+
+
+@receiver(post_save, sender=Classroom)
+@receiver(post_delete, sender=Classroom)
+def classroom_saved(sender, instance, update_fields=None, **kwargs):
+	if update_fields and not update_fields.intersection(INDEXED_FIELDS):
+		return
+	classroom_id = instance.id
+	transaction.on_commit(lambda: update_search_index([classroom_id]))
+	transaction.on_commit(lambda: classroom_typeahead.update([classroom_id]))
+
+
+@receiver(m2m_changed, sender=Classroom.professors.through)
+def classroom_professors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+		classrooms_edited([instance.id])
+	elif reverse and action in ('post_add', 'post_remove'):
+		classrooms_edited(list(pk_set))
+	elif reverse and action == 'pre_clear':
+		classrooms_edited(list(instance.classrooms.values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=Professor)
+def professor_saved(sender, instance, created, **kwargs):
+	if not created:
+		classrooms_edited(list(instance.classrooms.values_list('id', flat=True)))
+
+
+def rosters_changed(classroom_ids):
+	classroom_ids = list(classroom_ids)
+	if classroom_ids:
+		transaction.on_commit(lambda: touch_rosters(*classroom_ids))
+
+
+@receiver(m2m_changed, sender=Classroom.students.through)
+def classroom_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+		rosters_changed([instance.id])
+	elif reverse and action in ('post_add', 'post_remove'):
+		rosters_changed(pk_set)
+	elif reverse and action == 'pre_clear':
+		rosters_changed(instance.classrooms.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Account)
+def student_saved(sender, instance, created, update_fields=None, **kwargs):
+	if created or (update_fields and not update_fields.intersection(ROSTER_ACCOUNT_FIELDS)):
+		return
+	rosters_changed(instance.classrooms.values_list('id', flat=True))
@@ -0,0 +1,63 @@
+import uuid
+
+from django.core.cache import cache
+
+from ..accounts.models import Account
+
+ROSTER_VERSION_KEY = 'classrooms:roster_version:%d'
+ROSTER_KEY = 'classrooms:roster:%d:%s'
+ROSTER_TIMEOUT = 60 * 60 * 24
+ROSTER_PAGE_SIZE = 50
+# Account fields the snapshot shows, saving one of them refreshes the rosters of the account
+ROSTER_ACCOUNT_FIELDS = ('first_name', 'last_name', 'avatar1x', 'major')
+
+
+def touch_rosters(*classroom_ids):
+	"""Mark the rosters of the given classrooms as changed, called when students join, leave or edit their profile."""
+	version = uuid.uuid4().hex
+	cache.set_many(dict((ROSTER_VERSION_KEY % pk, version) for pk in classroom_ids), None)
+
+
+def get_roster_version(classroom_id):
+	key = ROSTER_VERSION_KEY % classroom_id
+	version = cache.get(key)
+	if version is None:
+		# add() so that processes racing after a cache flush settle on one version
+		cache.add(key, uuid.uuid4().hex, None)
+		version = cache.get(key)
+	return version
+
+
+def load_roster(classroom_id):
+	"""[{id, full_name, avatar1x, major}] of the classroom's students by name, in one query."""
+	avatars = Account._meta.get_field('avatar1x').storage
+	students = Account.objects.filter(classrooms=classroom_id).order_by('first_name', 'last_name', 'id') \
+		.values_list('id', 'first_name', 'last_name', 'avatar1x', 'major__major_short')
+	return [{'id': pk, 'full_name': '%s %s' % (first_name, last_name), 'avatar1x': avatars.url(avatar) if avatar else None, 'major': major}
+	        for pk, first_name, last_name, avatar, major in students]
+
+
+def get_roster(classroom_id):
+	"""
+	The classroom's roster snapshot, from the cache when this version was loaded before.
+
+	The cache key contains the version, so a snapshot loaded while the roster changed
+	is never served after touch_rosters.
+	"""
+	key = ROSTER_KEY % (classroom_id, get_roster_version(classroom_id))
+	roster = cache.get(key)
+	if roster is None:
+		roster = load_roster(classroom_id)
+		cache.set(key, roster, ROSTER_TIMEOUT)
+	return roster
+
+
+def paginate_roster(classroom_id, page=1, page_size=ROSTER_PAGE_SIZE):
+	"""{count, next, results} of a 1-based roster page, next is None on the last page."""
+	roster = get_roster(classroom_id)
+	start = (page - 1) * page_size
+	return {
+		'count': len(roster),
+		'next': page + 1 if start + page_size < len(roster) else None,
+		'results': roster[start:start + page_size],
+	}
@@ -0,0 +1,319 @@
+import cPickle as pickle
+import heapq
+import os
+import re
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+
+SEARCH_VERSION_KEY = 'classrooms:search_version'
+SEARCH_DELETED_KEY = 'classrooms:search_deleted'
+SEARCH_LIMIT = 50
+DEFAULT_BACKEND = 'classgotcha.apps.classrooms.search.LocalSearchBackend'
+DEFAULT_INDEX_PATH = 'local/tmp/classroom_search.index'
+
+# A word matching the class short or code outranks one from the name, professors or description
+FIELD_WEIGHTS = {'class_short': 8, 'class_code': 8, 'class_name': 4, 'professors': 3, 'description': 1}
+# Score factors of a query word matching a term exactly, as its prefix or with one typo
+EXACT, PREFIX, TYPO = 1.0, 0.6, 0.4
+# Shorter query words and words with digits (class codes and numbers are one digit apart) only match exactly or as a prefix
+TYPO_MIN_LENGTH = 4
+# Prefix expansions per query word, a single letter would otherwise touch every posting
+MAX_PREFIX_TERMS = 200
+# Catching up re-reads classrooms updated this long before the last one indexed, for transactions that committed late
+SYNC_OVERLAP = timedelta(minutes=5)
+# Deleted classroom ids the other processes drop when they catch up, the latest ones only
+DELETED_HISTORY = 1000
+# A process rewrites the snapshot after catching up or updating when it is older than this many seconds
+SNAPSHOT_INTERVAL = 10 * 60
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+	return WORD_RE.findall((text or '').lower())
+
+
+def deletions(word):
+	return set(word[:i] + word[i + 1:] for i in range(len(word)))
+
+
+def classroom_fields(classroom_ids=None):
+	"""Yield (classroom id, updated, {field: text}) of the given classrooms or all of them, in two queries."""
+	from models import Classroom
+	from ..accounts.models import Professor
+
+	classrooms = Classroom.objects.select_related('major') \
+		.only('class_name', 'class_number', 'class_code', 'description', 'updated', 'major__major_short') \
+		.prefetch_related(Prefetch('professors', Professor.objects.only('first_name', 'last_name')))
+	if classroom_ids is not None:
+		classrooms = classrooms.filter(pk__in=list(classroom_ids))
+	for classroom in classrooms:
+		yield classroom.id, classroom.updated, {
+			'class_short': classroom.class_short,
+			'class_code': classroom.class_code,
+			'class_name': classroom.class_name,
+			'professors': ' '.join('%s %s' % (professor.first_name, professor.last_name) for professor in classroom.professors.all()),
+			'description': classroom.description,
+		}
+
+
+def document_terms(fields):
+	"""{term: weight} of a classroom, each term weighted by the best field it appears in."""
+	terms = {}
+	for field, text in fields.items():
+		words = tokenize(text)
+		if field == 'class_short':
+			# 'CMPSC 121' is also searched for as 'cmpsc121'
+			words.append(''.join(words))
+		for word in words:
+			terms[word] = max(terms.get(word, 0), FIELD_WEIGHTS[field])
+	return terms
+
+
+class SearchIndex(object):
+	"""
+	Inverted index of classrooms, term -> {classroom id: weight}.
+
+	Terms are also kept in a sorted list for prefix matching and under each of their
+	one-letter deletions for typo matching, a query word and a term one edit apart
+	share a deletion or one is a deletion of the other.
+	"""
+
+	def __init__(self):
+		self.postings = {}
+		self.documents = {}
+		self.terms = []
+		self.deletes = {}
+		# Latest Classroom.updated indexed and the shared version it is current with
+		self.synced = None
+		self.version = None
+
+	def add(self, classroom_id, updated, terms, sort=True):
+		"""Index or re-index a classroom, returns whether its terms changed."""
+		self.synced = max(self.synced, updated) if self.synced else updated
+		if self.documents.get(classroom_id) == terms:
+			return False
+		self.remove(classroom_id)
+		self.documents[classroom_id] = terms
+		for term, weight in terms.items():
+			if term not in self.postings:
+				self.postings[term] = {}
+				if sort:
+					insort(self.terms, term)
+				if len(term) >= TYPO_MIN_LENGTH:
+					for deletion in deletions(term):
+						self.deletes.setdefault(deletion, set()).add(term)
+			self.postings[term][classroom_id] = weight
+		return True
+
+	def add_many(self, documents):
+		for classroom_id, updated, fields in documents:
+			self.add(classroom_id, updated, document_terms(fields), sort=False)
+		self.terms = sorted(self.postings)
+
+	def remove(self, classroom_id):
+		terms = self.documents.pop(classroom_id, None)
+		for term in terms or ():
+			postings = self.postings[term]
+			del postings[classroom_id]
+			if postings:
+				continue
+			del self.postings[term]
+			i = bisect_left(self.terms, term)
+			# add_many only sorts its new terms in at the end
+			if i < len(self.terms) and self.terms[i] == term:
+				self.terms.pop(i)
+			if len(term) >= TYPO_MIN_LENGTH:
+				for deletion in deletions(term):
+					self.deletes[deletion].discard(term)
+					if not self.deletes[deletion]:
+						del self.deletes[deletion]
+		return terms is not None
+
+	def match(self, word):
+		"""{term: factor} of the terms a query word matches."""
+		matches = {}
+		i = bisect_left(self.terms, word)
+		for term in self.terms[i:i + MAX_PREFIX_TERMS]:
+			if not term.startswith(word):
+				break
+			matches[term] = EXACT if term == word else PREFIX
+
+		if len(word) >= TYPO_MIN_LENGTH and word.isalpha():
+			candidates = set(self.deletes.get(word, ()))
+			for deletion in deletions(word):
+				if deletion in self.postings:
+					candidates.add(deletion)
+				candidates.update(self.deletes.get(deletion, ()))
+			for term in candidates:
+				matches.setdefault(term, TYPO)
+		return matches
+
+	def search(self, query, limit=SEARCH_LIMIT):
+		"""Ids of the best classrooms matching every word of the query, best first."""
+		scores = None
+		for word in tokenize(query):
+			word_scores = {}
+			for term, factor in self.match(word).items():
+				for classroom_id, weight in self.postings[term].items():
+					word_scores[classroom_id] = max(word_scores.get(classroom_id, 0), weight * factor)
+			if scores is None:
+				scores = word_scores
+			else:
+				scores = dict((classroom_id, score + word_scores[classroom_id]) for classroom_id, score in scores.items()
+				              if classroom_id in word_scores)
+		if not scores:
+			return []
+		return [classroom_id for classroom_id, score in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))]
+
+	def catch_up(self):
+		"""Index the classrooms changed since the last sync and drop the recently deleted ones."""
+		from models import Classroom
+
+		if self.synced:
+			self.add_many(classroom_fields(Classroom.objects.filter(updated__gte=self.synced - SYNC_OVERLAP).values_list('id', flat=True)))
+		else:
+			self.add_many(classroom_fields())
+		for classroom_id in cache.get(SEARCH_DELETED_KEY) or ():
+			self.remove(classroom_id)
+
+	def save(self, path):
+		# written aside and renamed, so other processes never load a half written file
+		temporary = '%s.%s' % (path, uuid.uuid4().hex)
+		with open(temporary, 'wb') as f:
+			pickle.dump(self.__dict__, f, pickle.HIGHEST_PROTOCOL)
+		os.rename(temporary, path)
+
+	@classmethod
+	def load(cls, path):
+		index = cls()
+		with open(path, 'rb') as f:
+			index.__dict__.update(pickle.load(f))
+		return index
+
+
+def get_search_version():
+	version = cache.get(SEARCH_VERSION_KEY)
+	if version is None:
+		# add() so that processes racing after a cache flush settle on one version
+		cache.add(SEARCH_VERSION_KEY, uuid.uuid4().hex, None)
+		version = cache.get(SEARCH_VERSION_KEY)
+	return version
+
+
+class LocalSearchBackend(object):
+	"""
+	The inverted index held in every process, the default backend.
+
+	A process starts from the snapshot at CLASSROOM_SEARCH_INDEX_PATH (or builds and
+	saves one) and catches up whenever the shared version moved, which only happens when
+	an indexed field of a classroom changed. The snapshot is rewritten at most every
+	SNAPSHOT_INTERVAL, so new processes have little to replay.
+	"""
+
+	def __init__(self):
+		self.path = getattr(settings, 'CLASSROOM_SEARCH_INDEX_PATH', DEFAULT_INDEX_PATH)
+		self.index = None
+
+	def get_index(self):
+		version = get_search_version()
+		if self.index is None:
+			if os.path.exists(self.path):
+				self.index = SearchIndex.load(self.path)
+			else:
+				self.rebuild()
+		if self.index.version != version:
+			self.index.catch_up()
+			self.index.version = version
+			self.save_snapshot()
+		return self.index
+
+	def save_snapshot(self):
+		try:
+			stale = time.time() - os.path.getmtime(self.path) > SNAPSHOT_INTERVAL
+		except OSError:
+			stale = True
+		if stale:
+			self.index.save(self.path)
+
+	def search(self, query, limit=SEARCH_LIMIT):
+		return self.get_index().search(query, limit)
+
+	def update(self, classroom_ids):
+		index = self.get_index()
+		found, changed = set(), False
+		for classroom_id, updated, fields in classroom_fields(classroom_ids):
+			changed |= index.add(classroom_id, updated, document_terms(fields))
+			found.add(classroom_id)
+		deleted = [classroom_id for classroom_id in set(classroom_ids) - found if index.remove(classroom_id)]
+		if deleted:
+			# not atomic, an id lost to a concurrent delete still drops out when search results are hydrated
+			cache.set(SEARCH_DELETED_KEY, ((cache.get(SEARCH_DELETED_KEY) or []) + deleted)[-DELETED_HISTORY:], None)
+		if changed or deleted:
+			# the other processes catch up on their next search
+			index.version = uuid.uuid4().hex
+			cache.set(SEARCH_VERSION_KEY, index.version, None)
+			self.save_snapshot()
+
+	def rebuild(self):
+		index = SearchIndex()
+		index.version = get_search_version()
+		index.add_many(classroom_fields())
+		index.save(self.path)
+		self.index = index
+		return len(index.documents)
+
+
+class SolrSearchBackend(object):
+	"""Classrooms indexed in the Solr core at CLASSROOM_SEARCH_SOLR_URL, for deployments running one."""
+
+	def __init__(self):
+		import pysolr
+		self.solr = pysolr.Solr(settings.CLASSROOM_SEARCH_SOLR_URL, timeout=10)
+
+	def search(self, query, limit=SEARCH_LIMIT):
+		words = tokenize(query)
+		if not words:
+			return []
+		query = ' AND '.join('(%s OR %s* OR %s~1)' % (word, word, word) if len(word) >= TYPO_MIN_LENGTH and word.isalpha() else '(%s OR %s*)' % (word, word)
+		                     for word in words)
+		qf = ' '.join('%s^%d' % (field, weight) for field, weight in FIELD_WEIGHTS.items())
+		return [int(document['id']) for document in self.solr.search(query, defType='edismax', qf=qf, fl='id', rows=limit)]
+
+	def update(self, classroom_ids):
+		documents = [dict(fields, id=classroom_id) for classroom_id, updated, fields in classroom_fields(classroom_ids)]
+		if documents:
+			self.solr.add(documents)
+		deleted = set(classroom_ids) - set(document['id'] for document in documents)
+		if deleted:
+			self.solr.delete(q='id:(%s)' % ' OR '.join(str(classroom_id) for classroom_id in deleted))
+
+	def rebuild(self):
+		self.solr.delete(q='*:*')
+		documents = [dict(fields, id=classroom_id) for classroom_id, updated, fields in classroom_fields()]
+		self.solr.add(documents)
+		return len(documents)
+
+
+_backend = {}
+
+
+def get_search_backend():
+	if 'backend' not in _backend:
+		_backend['backend'] = import_string(getattr(settings, 'CLASSROOM_SEARCH_BACKEND', DEFAULT_BACKEND))()
+	return _backend['backend']
+
+
+def search_classrooms(query, limit=SEARCH_LIMIT):
+	return get_search_backend().search(query, limit)
+
+
+def update_search_index(classroom_ids):
+	get_search_backend().update(list(classroom_ids))
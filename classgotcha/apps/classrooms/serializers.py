@@ -2,28 +2,32 @@ from models import Classroom, Major, OfficeHour
 from rest_framework import serializers
 
 from ..tasks.serializers import ClassTimeTaskSerializer
-from ..accounts.serializers import BasicAccountSerializer, ProfessorSerializer, SemesterSerializer, BasicProfessorSerializer
+from ..accounts.serializers import BasicAccountSerializer, SemesterSerializer, BasicProfessorSerializer
 from ..tags.serializers import ClassFolderSerializer
+from ..mixins import EagerLoadingMixin
 
 
-class MajorSerializer(serializers.ModelSerializer):
+class MajorSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class Meta:
 		model = Major
 		fields = '__all__'
 
 
-class MiniClassroomSerializer(serializers.ModelSerializer):
+class MiniClassroomSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+	select_related_fields = ('major',)
+
 	class Meta:
 		model = Classroom
 		fields = ('id', 'class_code', 'class_short', 'class_section',)
 
 
-class BasicClassroomSerializer(serializers.ModelSerializer):
+class BasicClassroomSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	students_count = serializers.ReadOnlyField()
 	class_short = serializers.ReadOnlyField()
 	class_time = ClassTimeTaskSerializer()
 	semester = SemesterSerializer()
 	professors = BasicProfessorSerializer(many=True)
+	select_related_fields = ('major',)
 
 	class Meta:
 		model = Classroom
@@ -31,8 +35,9 @@ class BasicClassroomSerializer(serializers.ModelSerializer):
 		          'class_section', 'description', 'class_time', 'semester', 'professors')
 
 
-class ClassroomSerializer(serializers.ModelSerializer):
+class ClassroomSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class_time = ClassTimeTaskSerializer()
+	# hidden unless asked for with ?expand=students (or ?fields=students), students/ pages through the roster
 	students = BasicAccountSerializer(many=True)
 	# groups = serializers.PrimaryKeyRelatedField(many=True, queryset=Group.objects.all())
 	students_count = serializers.ReadOnlyField()
@@ -41,14 +46,15 @@ class ClassroomSerializer(serializers.ModelSerializer):
 	semester = SemesterSerializer()
 	major = MajorSerializer()
 	professors = BasicProfessorSerializer(many=True)
+	expandable_fields = ('students',)
 
 	class Meta:
 		model = Classroom
 		fields = '__all__'
 
 
-class OfficeHourSerializer(serializers.ModelSerializer):
-	professors = ProfessorSerializer(many=True)
+class OfficeHourSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+	professor = BasicProfessorSerializer()
 	time = ClassTimeTaskSerializer()
 
 	class Meta:
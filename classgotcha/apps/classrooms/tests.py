@@ -0,0 +1,230 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from conflicts import ScheduleIndex
+from enrollment import ClassroomStudent, TaskInvolved, enroll, unenroll
+from models import Classroom, Major, Semester
+from roster import get_roster_version
+from search import LocalSearchBackend, SearchIndex, document_terms
+from ..accounts.models import Account, FriendRecommendation
+from ..tasks.ical import get_calendar_version
+from ..tasks.models import Task
+
+
+class ClassroomsMixin(object):
+	count = 0
+
+	def add_classroom(self, *students, **class_time):
+		self.count += 1
+		class_time = Task.objects.create(task_name='class %d' % self.count, category=Task.CLASS, **dict({'repeat': 'MoWeFr'}, **class_time))
+		classroom = Classroom.objects.create(class_name='Class %d' % self.count, class_number=str(100 + self.count),
+		                                     class_code=str(10000 + self.count), class_section='001', class_location='',
+		                                     class_time=class_time, major=Major.objects.get_or_create(major_short='CMPSC')[0],
+		                                     semester=Semester.objects.get_or_create(name='Fall 2017')[0])
+		Task.objects.create(task_name='homework %d' % self.count, category=Task.HOMEWORK, task_of_classroom=classroom)
+		for student in students:
+			enroll(student, [classroom.pk])
+		return classroom
+
+	def add_account(self):
+		self.count += 1
+		return Account.objects.create(email='student%d@psu.edu' % self.count)
+
+
+class EnrollmentTest(ClassroomsMixin, TestCase):
+	def setUp(self):
+		self.account = self.add_account()
+		self.other = self.add_account()
+
+	def assertCounts(self, *classrooms):
+		for classroom in classrooms:
+			self.assertEqual(Classroom.objects.get(pk=classroom.pk).students_count,
+			                 ClassroomStudent.objects.filter(classroom_id=classroom.pk).count())
+
+	def involved(self, classrooms):
+		return set(TaskInvolved.objects.filter(account_id=self.account.pk, task__in=Task.objects.filter(task_of_classroom__in=classrooms))
+		           .values_list('task_id', flat=True))
+
+	def test_enroll_skips_joined_classrooms(self):
+		joined = self.add_classroom(self.account, self.other)
+		new = self.add_classroom(self.other)
+		empty = self.add_classroom()
+
+		self.assertEqual(sorted(enroll(self.account, [joined.pk, new.pk, empty.pk])), sorted([new.pk, empty.pk]))
+		self.assertEqual(enroll(self.account, [joined.pk, new.pk, empty.pk]), [])
+		self.assertEqual([Classroom.objects.get(pk=classroom.pk).students_count for classroom in (joined, new, empty)], [2, 2, 1])
+		self.assertCounts(joined, new, empty)
+		self.assertEqual(len(self.involved([joined, new, empty])), 3)
+		self.assertTrue(TaskInvolved.objects.filter(account_id=self.account.pk, task_id=new.class_time_id).exists())
+
+	def test_unenroll_non_member(self):
+		member, other = self.add_classroom(self.account), self.add_classroom(self.other)
+		empty = self.add_classroom()
+
+		self.assertEqual(unenroll(self.account, [member.pk, other.pk, empty.pk]), [member.pk])
+		self.assertEqual(unenroll(self.account, [member.pk, other.pk, empty.pk]), [])
+		self.assertEqual([Classroom.objects.get(pk=classroom.pk).students_count for classroom in (member, other, empty)], [0, 1, 0])
+		self.assertCounts(member, other, empty)
+		self.assertEqual(self.involved([member]), set())
+		self.assertTrue(TaskInvolved.objects.filter(account_id=self.other.pk, task__task_of_classroom=other).exists())
+
+
+class EnrollmentInvalidationTest(ClassroomsMixin, TransactionTestCase):
+	# rosters are touched on commit, which TestCase never reaches
+
+	def test_enroll_and_unenroll_invalidate(self):
+		account, classmate = self.add_account(), self.add_account()
+		classroom = self.add_classroom(classmate)
+		FriendRecommendation.objects.filter(account=classmate).update(dirty=False)
+		roster, calendar = get_roster_version(classroom.pk), get_calendar_version(account.pk)
+
+		enroll(account, [classroom.pk])
+		self.assertNotEqual(get_roster_version(classroom.pk), roster)
+		self.assertNotEqual(get_calendar_version(account.pk), calendar)
+		self.assertTrue(FriendRecommendation.objects.get(account=classmate).dirty)
+
+		roster, calendar = get_roster_version(classroom.pk), get_calendar_version(account.pk)
+		unenroll(account, [classroom.pk])
+		self.assertNotEqual(get_roster_version(classroom.pk), roster)
+		self.assertNotEqual(get_calendar_version(account.pk), calendar)
+
+
+def at(hour, minute=0):
+	return timezone.make_aware(datetime(2017, 8, 21, hour, minute))
+
+
+class ConflictsTest(ClassroomsMixin, TestCase):
+	def setUp(self):
+		self.account = self.add_account()
+		self.lecture = self.add_classroom(self.account, repeat='MoWeFr', start=at(9), end=at(10))
+		self.index = ScheduleIndex.for_account(self.account)
+
+	def conflicts(self, repeat, start, end):
+		class_time = Task(task_name='new', category=Task.CLASS, repeat=repeat, start=start, end=end)
+		class_time.save()
+		return self.index.conflicts(class_time)
+
+	def test_back_to_back(self):
+		self.assertEqual(self.conflicts('MoWeFr', at(10), at(11)), [])
+		self.assertEqual(self.conflicts('MoWeFr', at(8), at(9)), [])
+
+	def test_other_weekdays(self):
+		self.assertEqual(self.conflicts('TuTh', at(9), at(10)), [])
+		self.assertEqual(self.conflicts('', at(9), at(10)), [])
+
+	def test_overlap(self):
+		conflicts = self.conflicts('MoTuFr', at(9, 59), at(11))
+		self.assertEqual(conflicts, [{'task': self.lecture.class_time_id, 'task_name': self.lecture.class_time.task_name,
+		                              'classroom': self.lecture.pk, 'repeat_list': [1, 5]}])
+		self.assertEqual(len(self.conflicts('We', at(8), at(12))), 1)
+		self.assertEqual(len(self.conflicts('We', at(9, 15), at(9, 45))), 1)
+
+	def test_join_reports_partial_overlap(self):
+		lab = self.add_classroom(repeat='WeTh', start=at(9, 30), end=at(10, 30))
+		seminar = self.add_classroom(repeat='MoFr', start=at(10), end=at(11))
+		client = APIClient()
+		client.force_authenticate(self.account)
+		response = client.post('/account/classrooms/', {'classrooms': [lab.pk, seminar.pk]}, format='json')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(sorted(response.data['classrooms']), sorted([lab.pk, seminar.pk]))
+		self.assertEqual(response.data['conflicts'], {
+			str(lab.pk): [{'task': self.lecture.class_time_id, 'task_name': self.lecture.class_time.task_name,
+			               'classroom': self.lecture.pk, 'repeat_list': [3]}],
+			str(seminar.pk): [],
+		})
+
+
+def document(classroom_id, class_short, class_name, professors='', description=''):
+	return classroom_id, at(9), {'class_short': class_short, 'class_code': str(10000 + classroom_id), 'class_name': class_name,
+	                             'professors': professors, 'description': description}
+
+
+class SearchIndexTest(TestCase):
+	def setUp(self):
+		self.index = SearchIndex()
+		self.index.add_many([
+			document(1, 'CMPSC 121', 'Introduction to Programming', 'John Hannan'),
+			document(2, 'CMPSC 122', 'Intermediate Programming'),
+			document(3, 'MATH 140', 'Calculus with Analytic Geometry', description='Limits and derivatives'),
+		])
+
+	def assertConsistent(self):
+		self.assertEqual(self.index.terms, sorted(self.index.postings))
+		for terms in self.index.deletes.values():
+			self.assertTrue(terms <= set(self.index.postings))
+
+	def test_class_short(self):
+		self.assertEqual(self.index.search('cmpsc 121'), [1])
+		self.assertEqual(self.index.search('cmpsc121'), [1])
+		self.assertEqual(self.index.search('CMPSC'), [1, 2])
+		self.assertEqual(self.index.search('10003'), [3])
+
+	def test_prefix_and_weights(self):
+		self.assertEqual(self.index.search('prog'), [1, 2])
+		self.assertEqual(self.index.search('calc deriv'), [3])
+		# the class short outranks the name and the description
+		self.index.add(4, at(9), document_terms({'class_short': 'STAT 200', 'class_name': 'Math for statistics'}))
+		self.assertEqual(self.index.search('math'), [3, 4])
+
+	def test_typo(self):
+		self.assertEqual(self.index.search('calculas'), [3])
+		self.assertEqual(self.index.search('progrmming'), [1, 2])
+		self.assertEqual(self.index.search('hanan'), [1])
+		# shorter words only match exactly or as a prefix
+		self.assertEqual(self.index.search('mth'), [])
+
+	def test_no_typo_on_numbers(self):
+		self.assertEqual(self.index.search('cmpsc 131'), [])
+		self.assertEqual(self.index.search('cmpsc131'), [])
+		self.assertEqual(self.index.search('10004'), [])
+
+	def test_reindex_drops_old_terms(self):
+		self.assertTrue(self.index.add(1, at(10), document_terms(document(1, 'CMPSC 221', 'Data Structures')[2])))
+		self.assertFalse(self.index.add(1, at(10), document_terms(document(1, 'CMPSC 221', 'Data Structures')[2])))
+		self.assertEqual(self.index.search('introduction'), [])
+		self.assertEqual(self.index.search('hannan'), [])
+		self.assertEqual(self.index.search('cmpsc121'), [])
+		self.assertEqual(self.index.search('structurs'), [1])
+		self.assertNotIn('introduction', self.index.terms)
+		self.assertConsistent()
+
+	def test_remove_terms_of_add_many(self):
+		# the first version of 4 is replaced before add_many sorts its terms in
+		self.index.add_many([document(4, 'PHYS 211', 'Mechanics'), document(4, 'PHYS 212', 'Electricity'), document(5, 'PHYS 213', 'Fluids')])
+		self.assertEqual(self.index.search('mechanics'), [])
+		self.assertEqual(self.index.search('electricity'), [4])
+		self.assertTrue(self.index.remove(5))
+		self.assertFalse(self.index.remove(5))
+		self.assertEqual(self.index.search('fluids'), [])
+		self.assertEqual(self.index.search('phys'), [4])
+		self.assertConsistent()
+
+
+class SearchCatchUpTest(ClassroomsMixin, TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.settings = override_settings(CLASSROOM_SEARCH_INDEX_PATH=os.path.join(self.directory, 'search.index'))
+		self.settings.enable()
+
+	def tearDown(self):
+		self.settings.disable()
+		shutil.rmtree(self.directory)
+
+	def test_deleted_classroom_drops_out(self):
+		kept, deleted = self.add_classroom(), self.add_classroom()
+		# two processes sharing the cache and the snapshot
+		this, other = LocalSearchBackend(), LocalSearchBackend()
+		self.assertEqual(sorted(other.search('cmpsc')), sorted([kept.pk, deleted.pk]))
+
+		deleted_id = deleted.pk
+		deleted.delete()
+		this.update([deleted_id])
+		self.assertEqual(this.search('cmpsc'), [kept.pk])
+		self.assertEqual(other.search('cmpsc'), [kept.pk])
+		self.assertNotIn(deleted_id, other.index.documents)
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+from django.db.models import Case, F, When, Value
+
+from models import Major, Professor
+
+UPSERT_BATCH_SIZE = 500
+
+
+def bulk_update(model, changes):
+	"""
+	Apply {pk: {field: value}} in a single UPDATE ... SET field = CASE pk WHEN ... END.
+
+	Rows which don't change a field keep their current value.
+	"""
+	fields = set(field for values in changes.values() for field in values)
+	model.objects.filter(pk__in=list(changes)).update(**dict(
+		(field, Case(*[When(pk=pk, then=Value(values[field])) for pk, values in changes.items() if field in values],
+		             default=F(field), output_field=model._meta.get_field(field)))
+		for field in fields
+	))
+
+
+def bulk_upsert(model, key_field, rows, batch_size=UPSERT_BATCH_SIZE):
+	"""
+	Insert or update rows of model matched on key_field, which has to be indexed.
+
+	rows is a list of {field: value} dicts containing key_field. Existing rows are
+	resolved with one query per batch, new ones are written with bulk_create and
+	changed fields with one bulk UPDATE, so re-importing the same rows is a no-op.
+	Returns a report with the counts and a {key: pk} map of every row.
+	"""
+	report = {'created': 0, 'updated': 0, 'unchanged': 0, 'ids': {}}
+	# Later rows win when a key shows up twice
+	rows = list(OrderedDict((row[key_field], row) for row in rows).values())
+
+	for start in range(0, len(rows), batch_size):
+		batch = rows[start:start + batch_size]
+		keys = [row[key_field] for row in batch]
+		existing = {}
+		# Lowest pk wins when legacy rows share a key
+		for instance in model.objects.filter(**{key_field + '__in': keys}).order_by('-pk'):
+			existing[getattr(instance, key_field)] = instance
+
+		new, changes = [], {}
+		for row in batch:
+			instance = existing.get(row[key_field])
+			if instance is None:
+				new.append(model(**row))
+				continue
+			changed = dict((field, value) for field, value in row.items() if getattr(instance, field) != value)
+			if changed:
+				changes[instance.pk] = changed
+			report['ids'][row[key_field]] = instance.pk
+
+		if new:
+			model.objects.bulk_create(new)
+			created = model.objects.filter(**{key_field + '__in': [getattr(instance, key_field) for instance in new]})
+			report['ids'].update(created.values_list(key_field, 'pk'))
+		if changes:
+			bulk_update(model, changes)
+
+		report['created'] += len(new)
+		report['updated'] += len(changes)
+		report['unchanged'] += len(batch) - len(new) - len(changes)
+	return report
+
+
+def backfill_professor_keys(batch_size=UPSERT_BATCH_SIZE):
+	# Professors saved before name_key existed, a single empty query once they are all filled
+	missing = list(Professor.objects.filter(name_key='').values_list('pk', 'first_name', 'last_name'))
+	for start in range(0, len(missing), batch_size):
+		bulk_update(Professor, dict((pk, {'name_key': Professor.make_name_key(first_name, last_name)})
+		                            for pk, first_name, last_name in missing[start:start + batch_size]))
+
+
+def upsert_professors(rows, batch_size=UPSERT_BATCH_SIZE):
+	"""Upsert professors given as {'first_name', 'last_name', ...} dicts, matched on their normalized name."""
+	backfill_professor_keys()
+	rows = [dict(row, name_key=Professor.make_name_key(row['first_name'], row['last_name'])) for row in rows]
+	return bulk_upsert(Professor, 'name_key', rows, batch_size=batch_size)
+
+
+def upsert_majors(rows, batch_size=UPSERT_BATCH_SIZE):
+	"""Upsert majors given as {'major_short', ...} dicts, major_short is normalized to upper case."""
+	rows = [dict(row, major_short=row['major_short'].strip().upper()) for row in rows]
+	return bulk_upsert(Major, 'major_short', rows, batch_size=batch_size)
@@ -34,6 +34,14 @@ classroom_search = views.ClassroomViewSet.as_view({
 	'post': 'search'
 })
 
+classroom_office_hours = views.ClassroomViewSet.as_view({
+	'get': 'office_hours'
+})
+
+classroom_typeahead = views.ClassroomViewSet.as_view({
+	'get': 'typeahead'
+})
+
 classroom_course_upload = views.ClassroomViewSet.as_view({
 	'post': 'upload_course_info'
 })
@@ -53,11 +61,12 @@ urlpatterns = [
 	url(r'^(?P<pk>[0-9]+)/notes/$', classroom_notes, name='classroom-notes'),
 	url(r'^(?P<pk>[0-9]+)/tasks/$', classroom_tasks, name='classroom-tasks'),
 	url(r'^(?P<pk>[0-9]+)/students/$', classroom_students, name='classroom-students'),
+	url(r'^(?P<pk>[0-9]+)/office-hours/$', classroom_office_hours, name='classroom-office-hours'),
 	url(r'^(?P<pk>[0-9]+)/moments/$', classroom_moments, name='classroom-moments'),
-	url(r'^(?P<pk>[0-9]+)/moments/(?P<page>[0-9]+)/$', classroom_moments, name='classroom-moments-page'),
 	url(r'^(?P<pk>[0-9]+)/validate/$', classroom_validate, name='classroom-check'),
 	url(r'^(?P<pk>[0-9]+)/$', classroom_detail, name='classroom-detail'),
 	url(r'^search/$', classroom_search, name='classroom-search'),
+	url(r'^typeahead/$', classroom_typeahead, name='classroom-typeahead'),
 	url(r'^majors/$', majors_all, name='major-list'),
 
 	url(r'^course-upload/$', classroom_course_upload, name='classroom-course-upload'),
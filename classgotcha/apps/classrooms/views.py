@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
-import uuid, re, json, datetime
+import uuid, json, datetime
 from django.core.files.base import File
 from django.shortcuts import get_object_or_404
-from django.db import IntegrityError
 
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
@@ -13,13 +12,20 @@ from rest_framework.decorators import parser_classes
 from models import Classroom, Semester, Major, Professor
 # from ..chatrooms.models import Chatroom
 
-from serializers import ClassroomSerializer, MajorSerializer, OfficeHourSerializer
+from serializers import ClassroomSerializer, MiniClassroomSerializer, MajorSerializer, OfficeHourSerializer
 from ..posts.serializers import MomentSerializer, Note, NoteSerializer, Moment
+from ..posts.pagination import paginate_moments
 from ..tasks.serializers import Task, TaskSerializer, BasicTaskSerializer, CreateTaskSerializer
-from ..accounts.serializers import BasicClassroomSerializer, BasicAccountSerializer
+from ..accounts.serializers import BasicClassroomSerializer
 from ..tags.serializers import ClassFolderSerializer, Tag
 
 from ..badges.script import trigger_action
+from importers import import_courses
+from roster import paginate_roster
+from search import search_classrooms
+from upserts import upsert_majors, upsert_professors
+from ..typeahead import classroom_typeahead, hydrate
+from ..mixins import get_sparse_fieldset
 
 
 # from ..chatrooms.matrix.matrix_api import MatrixApi
@@ -46,9 +52,13 @@ class ClassroomViewSet(viewsets.ViewSet):
 	'''Can pass a filename as optional variable'''
 
 	def retrieve(self, request, pk):
-		classroom = get_object_or_404(self.queryset, pk=pk)
-		serializer = ClassroomSerializer(classroom)
-		return Response(serializer.data)
+		sparse = get_sparse_fieldset(request)
+		classroom = get_object_or_404(ClassroomSerializer.setup_eager_loading(self.queryset, **sparse), pk=pk)
+		data = ClassroomSerializer(classroom, **sparse).data
+		# students_count plus the first page of the cached roster, students/?page= has the rest
+		if not sparse['fields'] or 'roster' in sparse['fields']:
+			data['roster'] = paginate_roster(classroom.id)
+		return Response(data)
 
 	def update(self, request, pk):
 		classroom = get_object_or_404(self.queryset, pk=pk)
@@ -60,29 +70,20 @@ class ClassroomViewSet(viewsets.ViewSet):
 
 	@staticmethod
 	def search(request):
+		# class code, short ('cmpsc 121'), title, professor or description words, prefixes and small typos included
 		search_token = request.data.get('search', False)
 		if not search_token:
 			return Response(status=status.HTTP_400_BAD_REQUEST)
-		# only class code
-		if search_token.isdigit():
-			classrooms = Classroom.objects.filter(class_code=search_token)
-			serializer = ClassroomSerializer(classrooms, many=True)
-			return Response(serializer.data)
+		sparse = get_sparse_fieldset(request)
+		classrooms = hydrate(BasicClassroomSerializer.setup_eager_loading(Classroom.objects.all(), **sparse), search_classrooms(search_token))
+		return Response(BasicClassroomSerializer(classrooms, many=True, **sparse).data)
 
-		# major + class number
-		else:
-			match = re.match(r"([a-z]+) *([0-9a-z]*)", search_token, re.I)
-			if match:
-				items = match.groups()
-				# print items
-				class_major = items[0].upper()
-				class_number = items[1].upper()
-				major = get_object_or_404(Major.objects.all(), major_short=class_major)
-				classrooms = Classroom.objects.filter(major=major, class_number__contains=class_number) if class_number else Classroom.objects.filter(major=major)
-				serializer = BasicClassroomSerializer(classrooms, many=True)
-				return Response(serializer.data)
-			else:
-				return Response({})
+	@staticmethod
+	def typeahead(request):
+		# class short ('cmpsc 121', 'cmpsc121'), code or name prefixes, GET typeahead/?q=
+		classroom_ids = classroom_typeahead.lookup(request.query_params.get('q', ''))
+		classrooms = hydrate(MiniClassroomSerializer.setup_eager_loading(Classroom.objects.all()), classroom_ids)
+		return Response(MiniClassroomSerializer(classrooms, many=True).data)
 
 	def validate(self, request, pk):
 		classroom = get_object_or_404(self.queryset, pk=pk)
@@ -99,7 +100,7 @@ class ClassroomViewSet(viewsets.ViewSet):
 			return Response(status=status.HTTP_400_BAD_REQUEST)
 
 		classroom.syllabus = new_file
-		classroom.save()
+		classroom.save(update_fields=['syllabus'])
 		return Response(status=status.HTTP_200_OK)
 
 	@parser_classes((MultiPartParser, FormParser,))
@@ -139,21 +140,24 @@ class ClassroomViewSet(viewsets.ViewSet):
 
 			return Response(status=status.HTTP_201_CREATED)
 
-	def moments(self, request, pk, page=None):
-		# If no page provided, default is 1
-		if not page:
-			page = 1
+	def moments(self, request, pk):
 		classroom = get_object_or_404(self.queryset, pk=pk)
-		# 20 moments per page
-		moments = classroom.moments.filter(deleted=False).order_by('-created')[0:int(page) * 20]
-		serializer = MomentSerializer(moments, many=True)
+		sparse = get_sparse_fieldset(request)
+		moments = MomentSerializer.setup_eager_loading(classroom.moments.filter(deleted=False), **sparse)
+		try:
+			moments, next_cursor = paginate_moments(moments, request.query_params.get('cursor'))
+		except ValueError:
+			return Response({'detail': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+		serializer = MomentSerializer(moments, many=True, **sparse)
 
-		return Response(serializer.data)
+		return Response({'results': serializer.data, 'next': next_cursor})
 
 	def tasks(self, request, pk):
 		classroom = get_object_or_404(self.queryset, pk=pk)
 		if request.method == 'GET':
-			serializer = BasicTaskSerializer(classroom.tasks.all().order_by('end'), many=True)
+			sparse = get_sparse_fieldset(request)
+			tasks = BasicTaskSerializer.setup_eager_loading(classroom.tasks.all().order_by('end'), **sparse)
+			serializer = BasicTaskSerializer(tasks, many=True, **sparse)
 			return Response(serializer.data)
 		elif request.method == 'POST':
 			start = request.data.get('start', None)
@@ -181,9 +185,16 @@ class ClassroomViewSet(viewsets.ViewSet):
 			return Response(status=status.HTTP_201_CREATED)
 
 	def students(self, request, pk):
+		try:
+			page = max(int(request.query_params.get('page', 1)), 1)
+		except ValueError:
+			return Response(status=status.HTTP_400_BAD_REQUEST)
 		classroom = get_object_or_404(self.queryset, pk=pk)
-		serializer = BasicAccountSerializer(classroom.students, many=True)
-		return Response(serializer.data)
+		roster = paginate_roster(classroom.id, page)
+		fields = get_sparse_fieldset(request)['fields']
+		if fields:
+			roster['results'] = [dict((name, value) for name, value in student.items() if name in fields) for student in roster['results']]
+		return Response(roster)
 
 	def folders(self, request, pk):
 		if request.method == 'GET':
@@ -195,7 +206,9 @@ class ClassroomViewSet(viewsets.ViewSet):
 	def office_hours(self, request, pk):
 		if request.method == 'GET':
 			classroom = get_object_or_404(self.queryset, pk=pk)
-			return Response(OfficeHourSerializer(classroom.office_hours).data)
+			sparse = get_sparse_fieldset(request)
+			office_hours = OfficeHourSerializer.setup_eager_loading(classroom.office_hours.all(), **sparse)
+			return Response(OfficeHourSerializer(office_hours, many=True, **sparse).data)
 		elif request.method == 'POST':
 			# TODO
 			pass
@@ -208,86 +221,9 @@ class ClassroomViewSet(viewsets.ViewSet):
 		semester, created = Semester.objects.get_or_create(name="Fall 2017", start=datetime.datetime(year=2017, month=8, day=21), end=datetime.datetime(year=2017, month=12, day=8))
 
 		upload = request.FILES.get('file', False)
-		from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-		if type(upload) is InMemoryUploadedFile:
-			temp_file = upload
-		elif type(upload) is TemporaryUploadedFile:
-			temp_file = open(upload.temporary_file_path())
 		if upload:
-			course = json.load(temp_file)
-			for cours in course:
-				# print cours['description']
-				major_short = cours['course_short_name'].split()[0]
-
-				major = Major.objects.get(major_short=major_short)
-
-				try:
-					# create class time
-					time = Task.objects.create(task_name=cours['course_short_name'] + ' - ' + cours['course_section'],
-					                           location=cours['room'],
-					                           type=0,  # Event
-					                           category=0  # Class
-					                           )
-					class_time = cours['datetime'].split()
-					if len(class_time) == 4:
-						time.repeat = class_time[0]
-						time.start = datetime.datetime.strptime(class_time[1], '%I:%M%p')
-						time.end = datetime.datetime.strptime(class_time[3], '%I:%M%p')
-						time.save()
-					# print time.start, time.end, class_time[1], class_time[3]
-					# create classroom
-					classroom, created = Classroom.objects.get_or_create(class_code=cours['class_number'],
-					                                                     class_number=cours['course_short_name'].split()[1],
-					                                                     class_name=cours['course_full_name'],
-					                                                     description=cours['course_description'],
-					                                                     class_section=cours['course_section'],
-					                                                     class_credit=cours['course_credit'],
-					                                                     class_location=cours['room'],
-					                                                     class_time=time,
-					                                                     major=major,
-					                                                     semester=semester)
-					# create professor
-					if 'instructor1' in cours:
-						instructor_name = cours['instructor1'].upper().replace(',', '')
-						instructor1 = Professor.objects.filter(
-							first_name=instructor_name.split()[0],
-							last_name=instructor_name.split()[1])
-						if instructor1:
-							classroom.professors.add(instructor1[0])
-						else:
-							professor = Professor.objects.create(
-								first_name=instructor_name.split()[0],
-								last_name=instructor_name.split()[1])
-							classroom.professors.add(professor)
-
-					if 'instructor2' in cours:
-						instructor_name = cours['instructor2'].upper().replace(',', '')
-						instructor2 = Professor.objects.filter(
-							first_name=instructor_name.split()[0],
-							last_name=instructor_name.split()[1])
-						if instructor2:
-							classroom.professors.add(instructor2[0])
-						else:
-							professor = Professor.objects.create(
-								first_name=instructor_name.split()[0],
-								last_name=instructor_name.split()[1])
-							classroom.professors.add(professor)
-
-					# save classroom to get pk in db
-					classroom.save()
-
-				# create chatrooms
-				# matrix = MatrixApi(auth_token=request.user.matrix_token)
-				# matrix_id = matrix.create_room(name=cours['name'] + ' - ' + cours['section'] + ' Chat Room')['room_id']
-
-				# Chatroom.objects.create(creator=Account.objects.get(is_superuser=True),
-				#                         room_type="Classroom",
-				#                         # matrix_id=matrix_id,
-				#                         name=cours['name'] + ' - ' + cours['section'] + ' Chat Room',
-				#                         classroom=classroom)
-				except IntegrityError as e:
-					print e.message
-			return Response(status=status.HTTP_201_CREATED)
+			report = import_courses(upload, semester)
+			return Response(report, status=status.HTTP_201_CREATED)
 		else:
 			return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -297,18 +233,10 @@ class ClassroomViewSet(viewsets.ViewSet):
 			return Response(status=status.HTTP_403_FORBIDDEN)
 		upload = request.FILES.get('file', False)
 		if upload:
-			from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-			if type(upload) is InMemoryUploadedFile:
-				temp_file = upload
-			elif type(upload) is TemporaryUploadedFile:
-				temp_file = open(upload.temporary_file_path())
-			majors = json.load(temp_file)
-			try:
-				for major in majors:
-					Major.objects.create(major_short=major['major_short'], major_full=major['major_full'])
-			except IntegrityError as e:
-				print e.message
-			return Response(status=status.HTTP_201_CREATED)
+			majors = json.load(upload)
+			report = upsert_majors([{'major_short': major['major_short'], 'major_full': major['major_full']} for major in majors])
+			del report['ids']
+			return Response(report, status=status.HTTP_201_CREATED)
 		else:
 			return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -318,23 +246,16 @@ class ClassroomViewSet(viewsets.ViewSet):
 			return Response(status=status.HTTP_403_FORBIDDEN)
 		upload = request.FILES.get('file', False)
 		if upload:
-			from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-			if type(upload) is InMemoryUploadedFile:
-				temp_file = upload
-			elif type(upload) is TemporaryUploadedFile:
-				temp_file = open(upload.temporary_file_path())
-			professors = json.load(temp_file)
-			try:
-				for professor in professors:
-					name = professor['name'].upper().split()
-					email = professor.get('email', '')
-					office = professor.get('address', '')
-
-					Professor.objects.create(first_name=name[0], last_name=name[1], email=email, office=office)
-			except IntegrityError as e:
-				print e.message
-
-			return Response(status=status.HTTP_201_CREATED)
+			professors = []
+			for professor in json.load(upload):
+				name = professor['name'].upper().split()
+				professors.append({'first_name': name[0],
+				                   'last_name': name[1],
+				                   'email': professor.get('email', ''),
+				                   'office': professor.get('address', '')})
+			report = upsert_professors(professors)
+			del report['ids']
+			return Response(report, status=status.HTTP_201_CREATED)
 		else:
 			return Response(status=status.HTTP_400_BAD_REQUEST)
 
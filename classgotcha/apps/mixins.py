@@ -0,0 +1,130 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+_field_names = {}
+
+
+def parse_fieldset(value):
+	"""'id,professors.full_name' -> {'id': {}, 'professors': {'full_name': {}}}, None when not given."""
+	if not value:
+		return None
+	if isinstance(value, dict):
+		return value
+	tree = {}
+	for path in value.split(','):
+		node = tree
+		for name in path.strip().split('.'):
+			if name:
+				node = node.setdefault(name, {})
+	return tree or None
+
+
+def get_sparse_fieldset(request):
+	"""Serializer and setup_eager_loading kwargs of the ?fields= and ?expand= query parameters."""
+	return {'fields': parse_fieldset(request.query_params.get('fields')),
+	        'expand': parse_fieldset(request.query_params.get('expand'))}
+
+
+class EagerLoadingMixin(object):
+	"""
+	Serializer mixin which declares how a queryset has to be loaded to render it.
+
+	select_related_fields: forward relations joined into the same query
+	prefetch_related_fields: lookups (or Prefetch objects) loaded in one extra query each
+	annotate_queryset(): hook for per-row annotations, such as counters
+	expandable_fields: nested fields left out unless asked for with ?expand= (or ?fields=)
+
+	Nested serializers using the mixin are folded in automatically, forward relations
+	are joined and to-many relations get a Prefetch built from the nested plan.
+
+	Both the serializer (fields=, expand= kwargs) and the plan honor sparse fieldsets,
+	'?fields=id,professors.full_name&expand=students', a field left out is neither
+	rendered nor loaded.
+	"""
+	select_related_fields = ()
+	prefetch_related_fields = ()
+	expandable_fields = ()
+
+	def __init__(self, *args, **kwargs):
+		self.sparse_fields = parse_fieldset(kwargs.pop('fields', None))
+		self.sparse_expand = parse_fieldset(kwargs.pop('expand', None))
+		super(EagerLoadingMixin, self).__init__(*args, **kwargs)
+
+	def get_fields(self):
+		fields = super(EagerLoadingMixin, self).get_fields()
+		names, fieldset, expand = self.get_sparse_fields(self.sparse_fields, self.sparse_expand)
+		for name in list(fields):
+			if name not in names:
+				del fields[name]
+				continue
+			nested = fields[name].child if isinstance(fields[name], serializers.ListSerializer) else fields[name]
+			if isinstance(nested, EagerLoadingMixin):
+				nested.sparse_fields = fieldset.get(name) or None
+				nested.sparse_expand = expand.get(name) or None
+		return fields
+
+	@classmethod
+	def get_all_field_names(cls):
+		# every field the serializer can render, declared or built from Meta
+		if cls not in _field_names:
+			_field_names[cls] = tuple(super(EagerLoadingMixin, cls()).get_fields())
+		return _field_names[cls]
+
+	@classmethod
+	def get_sparse_fields(cls, fields=None, expand=None):
+		"""Names of the fields rendered for a fieldset, with the fieldsets of the nested ones."""
+		fields, expand = parse_fieldset(fields) or {}, parse_fieldset(expand) or {}
+		names = set()
+		for name in cls.get_all_field_names():
+			if name in fields or name in expand:
+				names.add(name)
+			elif not fields and name not in cls.expandable_fields:
+				names.add(name)
+		return names, fields, expand
+
+	@classmethod
+	def annotate_queryset(cls, queryset):
+		return queryset
+
+	@classmethod
+	def get_eager_loading_lookups(cls, prefix='', fields=None, expand=None):
+		names, fieldset, expand = cls.get_sparse_fields(fields, expand)
+		all_names = cls.get_all_field_names()
+
+		def wanted(lookup):
+			# lookups backing a field are dropped with it, the others (e.g. major for class_short) are kept
+			root = lookup.split('__')[0]
+			return root in names or root not in all_names
+
+		select_related = [prefix + field for field in cls.select_related_fields if wanted(field)]
+		prefetch_related = [prefix + lookup if isinstance(lookup, basestring) else Prefetch(prefix + lookup.prefetch_to, lookup.queryset)
+		                    for lookup in cls.prefetch_related_fields
+		                    if wanted(lookup if isinstance(lookup, basestring) else lookup.prefetch_to)]
+
+		for field_name, field in cls._declared_fields.items():
+			many = isinstance(field, serializers.ListSerializer)
+			nested = field.child if many else field
+			if not isinstance(nested, EagerLoadingMixin) or field_name not in names:
+				continue
+
+			source = prefix + (field.source or field_name)
+			nested_fields, nested_expand = fieldset.get(field_name) or None, expand.get(field_name) or None
+			if many:
+				queryset = nested.setup_eager_loading(nested.Meta.model.objects.all(), nested_fields, nested_expand)
+				prefetch_related.append(Prefetch(source, queryset=queryset))
+			else:
+				select_related.append(source)
+				nested_select, nested_prefetch = nested.get_eager_loading_lookups(source + '__', nested_fields, nested_expand)
+				select_related += nested_select
+				prefetch_related += nested_prefetch
+
+		return select_related, prefetch_related
+
+	@classmethod
+	def setup_eager_loading(cls, queryset, fields=None, expand=None):
+		select_related, prefetch_related = cls.get_eager_loading_lookups(fields=fields, expand=expand)
+		if select_related:
+			queryset = queryset.select_related(*select_related)
+		if prefetch_related:
+			queryset = queryset.prefetch_related(*prefetch_related)
+		return cls.annotate_queryset(queryset)
@@ -1,4 +1,4 @@
-from models import Notification
+from models import Notification, ArchivedNotification
 from django.contrib import admin
 
 
@@ -7,3 +7,10 @@ class NotificationAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Notification, NotificationAdmin)
+
+
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+	list_display = ['sender', 'receiver', 'created', 'archived']
+
+
+admin.site.register(ArchivedNotification, ArchivedNotificationAdmin)
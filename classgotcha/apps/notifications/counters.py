@@ -0,0 +1,42 @@
+import time
+
+from django.core.cache import cache
+
+from models import Notification
+
+UNREAD_KEY = 'notifications:unread:%d'
+# A counter recounted while a notification was being committed can be off by it, expiring bounds how long
+UNREAD_TIMEOUT = 60 * 10
+POLL_INTERVAL = 1.0
+
+
+def get_unread_count(account_id):
+	"""Unread notifications of the account, counted in the database only when the cache has no value."""
+	key = UNREAD_KEY % account_id
+	count = cache.get(key)
+	if count is None:
+		count = Notification.objects.filter(receiver_id=account_id, read=False).count()
+		# add() keeps a value another process set (and maybe incremented) in the meantime
+		cache.add(key, count, UNREAD_TIMEOUT)
+		count = cache.get(key, count)
+	return count
+
+
+def change_unread_counts(deltas):
+	"""Apply {account_id: delta} to the cached counters with atomic increments, missing ones are recounted on the next read."""
+	for account_id, delta in deltas.items():
+		if delta:
+			try:
+				cache.incr(UNREAD_KEY % account_id, delta)
+			except ValueError:
+				pass
+
+
+def wait_for_unread_count(account_id, known, timeout):
+	"""Return the unread count as soon as it differs from known, or after timeout seconds."""
+	deadline = time.time() + timeout
+	count = get_unread_count(account_id)
+	while count == known and time.time() < deadline:
+		time.sleep(min(POLL_INTERVAL, max(deadline - time.time(), 0)))
+		count = get_unread_count(account_id)
+	return count
@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from counters import change_unread_counts
+from models import Notification
+
+_state = threading.local()
+
+
+def deliver(items):
+	"""Write [(receiver_id, sender_id, content)] with a single insert, dropping duplicates."""
+	seen = set()
+	notifications = []
+	for item in items:
+		if item not in seen:
+			seen.add(item)
+			receiver_id, sender_id, content = item
+			notifications.append(Notification(receiver_id=receiver_id, sender_id=sender_id, content=content))
+	Notification.objects.bulk_create(notifications)
+	change_unread_counts(Counter(notification.receiver_id for notification in notifications))
+
+
+def notify_many(items):
+	"""
+	Send [(receiver_id, sender_id, content)] notifications.
+
+	Inside notification_batch() they are collected and written when the batch ends,
+	otherwise they are written right away.
+	"""
+	items = list(items)
+	batch = getattr(_state, 'batch', None)
+	if batch is not None:
+		batch.extend(items)
+	elif items:
+		deliver(items)
+
+
+def notify(receiver_id, content, sender_id=None):
+	notify_many([(receiver_id, sender_id, content)])
+
+
+@contextmanager
+def notification_batch():
+	"""
+	Collect every notification sent inside the block and write them with one insert.
+
+	The insert is deferred until the surrounding transaction commits. Nested batches
+	join the outermost one.
+	"""
+	if getattr(_state, 'batch', None) is not None:
+		yield
+		return
+
+	_state.batch = []
+	try:
+		yield
+		items = _state.batch
+	finally:
+		_state.batch = None
+	if items:
+		transaction.on_commit(lambda: deliver(items))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ...models import ArchivedNotification, Notification
+
+
+class Command(BaseCommand):
+	help = 'Archive (or delete) read notifications older than --days, in small batches'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--days', type=int, default=30, help='Only read notifications older than this are moved')
+		parser.add_argument('--delete', action='store_true', help='Delete instead of archiving')
+		parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+		parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+
+	def handle(self, *args, **options):
+		cutoff = timezone.now() - timedelta(days=options['days'])
+		old = Notification.objects.filter(read=True, created__lt=cutoff).order_by('pk')
+		started = time.time()
+		last_pk, moved, batches = 0, 0, 0
+
+		while True:
+			# Walk the primary key so every batch is a short range scan and each transaction only locks its own rows
+			rows = list(old.filter(pk__gt=last_pk).values('id', 'receiver_id', 'sender_id', 'content', 'created')[:options['batch_size']])
+			if not rows:
+				break
+			last_pk = rows[-1]['id']
+			with transaction.atomic():
+				if not options['delete']:
+					ArchivedNotification.objects.bulk_create([ArchivedNotification(**row) for row in rows])
+				Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+			moved += len(rows)
+			batches += 1
+			self.stdout.write('batch %d: %d rows (%d total, %.1f rows/sec)' % (batches, len(rows), moved, moved / max(time.time() - started, 1e-6)))
+			time.sleep(options['sleep'])
+
+		self.stdout.write('%s %d read notifications older than %s in %d batches (%.1fs)' % (
+			'Deleted' if options['delete'] else 'Archived', moved, cutoff.date(), batches, time.time() - started))
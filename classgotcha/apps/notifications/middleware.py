@@ -0,0 +1,12 @@
+from dispatch import notification_batch
+
+
+class NotificationBatchMiddleware(object):
+	"""Write all notifications sent while handling a request with a single insert."""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		with notification_batch():
+			return self.get_response(request)
@@ -8,5 +8,21 @@ class Notification(models.Model):
 	read = models.BooleanField(default=False)
 	created = models.DateTimeField(auto_now_add=True)
 
+	class Meta:
+		# Unread lookups of a receiver, newest first
+		index_together = (('receiver', 'read', 'created'),)
+
+	def __unicode__(self):
+		return self.content
+
+
+class ArchivedNotification(models.Model):
+	# Read notifications moved out of Notification by compact_notifications
+	receiver = models.ForeignKey('accounts.Account', related_name='archived_notifications')
+	sender = models.ForeignKey('accounts.Account', related_name='archived_send_notifications', null=True, blank=True)
+	content = models.CharField(max_length=200)
+	created = models.DateTimeField()
+	archived = models.DateTimeField(auto_now_add=True)
+
 	def __unicode__(self):
 		return self.content
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from counters import UNREAD_KEY, get_unread_count
+from dispatch import notify
+from models import Notification
+from ..accounts.models import Account
+
+
+class ReadTest(TestCase):
+	def setUp(self):
+		self.account = Account.objects.create(email='me@psu.edu')
+		self.other = Account.objects.create(email='other@psu.edu')
+		cache.delete_many([UNREAD_KEY % self.account.pk, UNREAD_KEY % self.other.pk])
+		self.client = APIClient()
+		self.client.force_authenticate(self.account)
+		notify(self.account.pk, 'first')
+		notify(self.account.pk, 'second')
+		self.first, self.second = Notification.objects.filter(receiver=self.account).order_by('id')
+
+	def read(self, pk):
+		return self.client.post('/notification/read/%d/' % pk)
+
+	def test_read_twice(self):
+		self.assertEqual(get_unread_count(self.account.pk), 2)
+		response = self.read(self.first.pk)
+		self.assertEqual((response.status_code, response.data), (200, {'read': 1}))
+		self.assertEqual(get_unread_count(self.account.pk), 1)
+
+		response = self.read(self.first.pk)
+		self.assertEqual((response.status_code, response.data), (200, {'read': 0}))
+		self.assertEqual(get_unread_count(self.account.pk), 1)
+		self.assertTrue(Notification.objects.get(pk=self.first.pk).read)
+		self.assertFalse(Notification.objects.get(pk=self.second.pk).read)
+
+	def test_read_missing_or_not_received(self):
+		notify(self.other.pk, 'not yours')
+		theirs = Notification.objects.get(receiver=self.other)
+		self.assertEqual(self.read(theirs.pk).status_code, 404)
+		self.assertEqual(self.read(self.second.pk + 100).status_code, 404)
+		self.assertFalse(Notification.objects.get(pk=theirs.pk).read)
+		self.assertEqual(get_unread_count(self.account.pk), 2)
+
+	def test_read_many_counts_unread_only(self):
+		self.read(self.first.pk)
+		response = self.client.post('/notification/read/', {'ids': [self.first.pk, self.second.pk]}, format='json')
+		self.assertEqual((response.status_code, response.data), (200, {'read': 1}))
+		self.assertEqual(get_unread_count(self.account.pk), 0)
@@ -9,7 +9,18 @@ notification_read = views.NotificationViewSet.as_view({
 	'post': 'read'
 })
 
+notification_count = views.NotificationViewSet.as_view({
+	'get': 'count'
+})
+
+notification_poll = views.NotificationViewSet.as_view({
+	'get': 'poll'
+})
+
 urlpatterns = [
 	url(r'^fetch/$', notification_fetch, name='notification-fetch'),
+	url(r'^read/$', notification_read, name='notification-read-many'),
 	url(r'^read/(?P<pk>[0-9]+)/$', notification_read, name='notification-read'),
+	url(r'^count/$', notification_count, name='notification-count'),
+	url(r'^poll/$', notification_poll, name='notification-poll'),
 ]
@@ -1,9 +1,13 @@
-from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from rest_framework import permissions, viewsets, status
 from rest_framework.response import Response
 
 from models import Notification
 from serializers import NotificationSerializer
+from counters import change_unread_counts, get_unread_count, wait_for_unread_count
+
+# Long polls are answered after at most this many seconds, each one holds a worker meanwhile
+POLL_TIMEOUT = 5
 
 
 class NotificationViewSet(viewsets.ViewSet):
@@ -17,8 +21,42 @@ class NotificationViewSet(viewsets.ViewSet):
 		serializer = NotificationSerializer(notifications, many=True)
 		return Response(serializer.data)
 
-	def read(self, request, pk):
-		notification = get_object_or_404(self.queryset, id=pk)
-		notification.read = True
-		notification.save()
-		return Response(status=status.HTTP_200_OK)
+	def count(self, request):
+		return Response({'count': get_unread_count(request.user.id)})
+
+	def poll(self, request):
+		# Wait until the unread count differs from the one the client knows, then fetch
+		try:
+			known = int(request.query_params.get('count', -1))
+			timeout = min(float(request.query_params.get('timeout', POLL_TIMEOUT)), POLL_TIMEOUT)
+		except ValueError:
+			return Response(status=status.HTTP_400_BAD_REQUEST)
+		count = wait_for_unread_count(request.user.id, known, timeout)
+		return Response({'count': count, 'changed': count != known})
+
+	def read(self, request, pk=None):
+		notifications = self.queryset.filter(receiver_id=request.user.id)
+		if pk:
+			# marking an already read notification again is fine, only a missing one is a 404
+			count = notifications.filter(id=pk).update(read=True)
+			if not count and not Notification.objects.filter(receiver_id=request.user.id, id=pk).exists():
+				return Response(status=status.HTTP_404_NOT_FOUND)
+			change_unread_counts({request.user.id: -count})
+			return Response({'read': count}, status=status.HTTP_200_OK)
+		elif request.data.get('ids'):
+			try:
+				notifications = notifications.filter(id__in=[int(i) for i in request.data.get('ids')])
+			except (TypeError, ValueError):
+				return Response(status=status.HTTP_400_BAD_REQUEST)
+		elif request.data.get('until'):
+			until = parse_datetime(request.data.get('until'))
+			if until is None:
+				return Response(status=status.HTTP_400_BAD_REQUEST)
+			notifications = notifications.filter(created__lte=until)
+		else:
+			return Response(status=status.HTTP_400_BAD_REQUEST)
+
+		# only the notifications still unread are updated, so the counter drops by the ones changing state
+		count = notifications.update(read=True)
+		change_unread_counts({request.user.id: -count})
+		return Response({'read': count}, status=status.HTTP_200_OK)
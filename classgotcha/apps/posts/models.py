@@ -1,7 +1,9 @@
 from ..accounts.models import Account, Professor
 from ..classrooms.models import Classroom
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 from ..accounts.models import Account
 from ..classrooms.models import Classroom
@@ -74,6 +76,8 @@ class Moment(models.Model):
 	flagged_users = models.ManyToManyField(Account)
 	liked_users = models.ManyToManyField(Account, related_name='liked')
 	classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE, related_name='moments', null=True, blank=True)
+	# Counters, kept in sync with F() updates, see reconcile_counters
+	likes = models.IntegerField(default=0)
 	# Timestamp
 	created = models.DateTimeField(auto_now_add=True)
 	updated = models.DateTimeField(auto_now=True)
@@ -81,14 +85,14 @@ class Moment(models.Model):
 	# Relatives
 	# 1) comments
 
+	class Meta:
+		# Feeds seek on (created, id) within a classroom or a creator, see pagination.py
+		index_together = (('classroom', 'created', 'id'), ('creator', 'created', 'id'))
+
 	@property
 	def flagged(self):
 		return self.flagged_users.all().count() >= 3
 
-	@property
-	def likes(self):
-		return self.liked_users.all().count()
-
 
 class Post(models.Model):
 	TAG_CHOICES = ((0, 'Bug Report'),
@@ -105,6 +109,8 @@ class Post(models.Model):
 	# Relations
 	tag = models.IntegerField(choices=TAG_CHOICES, default=0)
 	creator = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='posts', null=True, blank=True)
+	# Counters, kept in sync with F() updates, see reconcile_counters
+	comments_count = models.IntegerField(default=0)
 	# Timestamp
 	created = models.DateTimeField(auto_now_add=True)
 	updated = models.DateTimeField(auto_now=True)
@@ -119,10 +125,6 @@ class Post(models.Model):
 		else:
 			return False
 
-	@property
-	def comments_count(self):
-		return self.comments.all().count()
-
 
 class Comment(models.Model):
 	# Basic
@@ -140,6 +142,18 @@ class Comment(models.Model):
 	updated = models.DateTimeField(auto_now=True)
 
 
+class TimelineEntry(models.Model):
+	# A moment pushed into an account's home timeline, see timeline.py
+	account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='timeline_entries')
+	moment = models.ForeignKey(Moment, on_delete=models.CASCADE, related_name='timeline_entries')
+	# Copy of moment.created, so timelines can be trimmed without a join
+	created = models.DateTimeField()
+
+	class Meta:
+		unique_together = ('account', 'moment')
+		index_together = (('account', 'created', 'moment'),)
+
+
 class Notification(models.Model):
 	content = models.TextField(max_length=200)
 	user = models.ForeignKey(Account)
@@ -147,3 +161,11 @@ class Notification(models.Model):
 
 	def __unicode__(self):
 		return self.content
+
+
+@receiver(post_save, sender=Moment)
+def moment_created(sender, instance, created, **kwargs):
+	# every moment reaches the timelines, whether posted, or created for a new note or task
+	if created:
+		from timeline import fan_out_moment
+		transaction.on_commit(lambda: fan_out_moment(instance))
@@ -0,0 +1,41 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+MOMENTS_PAGE_SIZE = 20
+
+
+def encode_cursor(moment):
+	return base64.urlsafe_b64encode('%s|%d' % (moment.created.isoformat(), moment.pk))
+
+
+def decode_cursor(cursor):
+	"""Return the (created, id) position encoded in cursor, raises ValueError when it is malformed."""
+	try:
+		created, pk = base64.urlsafe_b64decode(str(cursor)).split('|')
+		created, pk = parse_datetime(created), int(pk)
+	except (TypeError, ValueError, UnicodeError):
+		raise ValueError('Invalid cursor')
+	if created is None:
+		raise ValueError('Invalid cursor')
+	return created, pk
+
+
+def paginate_moments(queryset, cursor=None, page_size=MOMENTS_PAGE_SIZE):
+	"""
+	Return (moments, next_cursor) for the page of queryset after cursor, newest first.
+
+	Pages are taken by seeking past the last (created, id) seen instead of an offset,
+	so every page costs the same index range scan no matter how deep it is.
+	next_cursor is None on the last page.
+	"""
+	queryset = queryset.order_by('-created', '-id')
+	if cursor:
+		created, pk = decode_cursor(cursor)
+		queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=pk))
+
+	# One extra row tells whether there is a next page
+	moments = list(queryset[:page_size + 1])
+	next_cursor = encode_cursor(moments[page_size - 1]) if len(moments) > page_size else None
+	return moments[:page_size], next_cursor
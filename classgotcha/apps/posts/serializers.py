@@ -1,11 +1,15 @@
+from django.db.models import Prefetch
+
 from models import Moment, Comment, Post, Note
+from ..accounts.models import Account
 from ..accounts.serializers import BasicAccountSerializer, MiniAccountSerializer
 from ..tags.serializers import BasicTagSerializer
 from ..classrooms.serializers import MiniClassroomSerializer
+from ..mixins import EagerLoadingMixin
 from rest_framework import serializers
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	creator = MiniAccountSerializer(required=False)
 
 	class Meta:
@@ -13,21 +17,22 @@ class CommentSerializer(serializers.ModelSerializer):
 		fields = '__all__'
 
 
-class MomentSerializer(serializers.ModelSerializer):
+class MomentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	comments = CommentSerializer(required=False, many=True)
 	classroom = MiniClassroomSerializer(required=False)
 	creator = MiniAccountSerializer(required=False)
-	likes = serializers.SerializerMethodField()
+	likes = serializers.ReadOnlyField()
+
+	# liked_users and flagged_users render as id lists
+	prefetch_related_fields = (Prefetch('liked_users', queryset=Account.objects.only('id')),
+	                           Prefetch('flagged_users', queryset=Account.objects.only('id')))
 
 	class Meta:
 		model = Moment
 		fields = '__all__'
 
-	def get_likes(self, obj):
-		return obj.likes
-
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	comments = CommentSerializer(required=False, many=True)
 	creator = MiniAccountSerializer(required=False)
 
@@ -36,7 +41,7 @@ class PostSerializer(serializers.ModelSerializer):
 		fields = '__all__'
 
 
-class BasicPostSerializer(serializers.ModelSerializer):
+class BasicPostSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	creator = MiniAccountSerializer(required=False)
 	comments_count = serializers.ReadOnlyField()
 
@@ -49,7 +54,7 @@ class BasicPostSerializer(serializers.ModelSerializer):
 # from ..tasks.models import Task
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	# tasks = serializers.PrimaryKeyRelatedField(many=True, queryset=Task.objects.all())
 	# groups = serializers.PrimaryKeyRelatedField(many=True, queryset=Group.objects.all())
 	overall_rating = serializers.ReadOnlyField()
@@ -0,0 +1,46 @@
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from models import Moment
+from ..accounts.models import Account
+from ..classrooms.models import Classroom, Major, Semester
+from ..tasks.models import Task
+
+
+class TimelineFanOutTest(TransactionTestCase):
+	# fan_out_moment runs on commit, which TestCase never reaches
+
+	def setUp(self):
+		self.author = Account.objects.create(email='author@psu.edu', first_name='Author')
+		self.classmate = Account.objects.create(email='classmate@psu.edu', first_name='Classmate')
+		class_time = Task.objects.create(task_name='class', category=Task.CLASS, repeat='MoWeFr')
+		self.classroom = Classroom.objects.create(class_name='Intro', class_number='121', class_code='10001', class_section='001',
+		                                          class_location='', class_time=class_time, major=Major.objects.create(major_short='CMPSC'),
+		                                          semester=Semester.objects.create(name='Fall 2017'))
+		self.classroom.students.add(self.author, self.classmate)
+		Classroom.objects.filter(pk=self.classroom.pk).update(students_count=2)
+
+	def get_timeline(self, account):
+		client = APIClient()
+		client.force_authenticate(account)
+		response = client.get('/account/timeline/')
+		self.assertEqual(response.status_code, 200)
+		return [moment['id'] for moment in response.data['results']]
+
+	def test_classroom_task_moment_reaches_classmates(self):
+		client = APIClient()
+		client.force_authenticate(self.author)
+		response = client.post('/classroom/%d/tasks/' % self.classroom.pk, {
+			'task_name': 'homework 1', 'category': Task.HOMEWORK, 'start': '', 'end': '2017-10-20T23:59:00Z',
+			'task_of_classroom': self.classroom.pk}, format='json')
+		self.assertEqual(response.status_code, 201)
+
+		moment = Moment.objects.get(classroom=self.classroom)
+		self.assertEqual(self.get_timeline(self.classmate), [moment.pk])
+		self.assertEqual(self.get_timeline(self.author), [moment.pk])
+
+	def test_created_moment_fans_out_once(self):
+		moment = Moment.objects.create(content='hello', creator=self.author, classroom=self.classroom)
+		moment.save()
+		self.assertEqual(self.get_timeline(self.classmate), [moment.pk])
+		self.assertEqual(moment.timeline_entries.count(), 2)
@@ -0,0 +1,71 @@
+from django.db.models import Q
+
+from models import Moment, TimelineEntry, PRIVATE
+from pagination import MOMENTS_PAGE_SIZE, encode_cursor, paginate_moments
+from ..accounts.models import Account
+from ..classrooms.models import Classroom
+
+# Timelines keep only their newest entries, older moments stay reachable from the classroom feeds
+TIMELINE_LENGTH = 800
+# Moments of bigger classrooms are not pushed to every student, they are merged in when a timeline is read
+FANOUT_MAX_STUDENTS = 300
+
+Friendship = Account.friends.through
+ClassroomStudent = Classroom.students.through
+
+
+def get_followers(moment):
+	"""Ids of the accounts whose timelines the moment is pushed to."""
+	account_ids = set([moment.creator_id]) if moment.creator_id else set()
+	if moment.permission == PRIVATE:
+		return account_ids
+
+	account_ids.update(Friendship.objects.filter(to_account_id=moment.creator_id).values_list('from_account_id', flat=True))
+	if moment.classroom_id and Classroom.objects.filter(pk=moment.classroom_id, students_count__lte=FANOUT_MAX_STUDENTS).exists():
+		account_ids.update(ClassroomStudent.objects.filter(classroom_id=moment.classroom_id).values_list('account_id', flat=True))
+	return account_ids
+
+
+def fan_out_moment(moment):
+	"""Push a new moment into the timelines of its creator's friends and its classroom, in one insert."""
+	TimelineEntry.objects.bulk_create([
+		TimelineEntry(account_id=account_id, moment_id=moment.pk, created=moment.created)
+		for account_id in get_followers(moment)
+	])
+
+
+def trim_timeline(account_id):
+	entries = TimelineEntry.objects.filter(account_id=account_id).order_by('-created', '-moment_id')
+	cutoff = list(entries.values_list('created', 'moment_id')[TIMELINE_LENGTH:TIMELINE_LENGTH + 1])
+	if cutoff:
+		created, moment_id = cutoff[0]
+		entries.filter(Q(created__lt=created) | Q(created=created, moment_id__lte=moment_id)).delete()
+
+
+def get_timeline(account, cursor=None, page_size=MOMENTS_PAGE_SIZE):
+	"""
+	Return (moment ids, next_cursor) of the account's home timeline page after cursor.
+
+	The pushed entries are merged with the newest moments of the account's classrooms
+	that are too large to fan out to. Both sides seek with the same (created, id) cursor,
+	so the merged page costs one bounded query per side. Raises ValueError on a malformed cursor.
+	"""
+	if not cursor:
+		trim_timeline(account.id)
+
+	sources = [Moment.objects.filter(timeline_entries__account=account)]
+	large_classroom_ids = list(ClassroomStudent.objects.filter(account_id=account.id, classroom__students_count__gt=FANOUT_MAX_STUDENTS)
+	                           .values_list('classroom_id', flat=True))
+	if large_classroom_ids:
+		sources.append(Moment.objects.filter(classroom_id__in=large_classroom_ids).exclude(permission=PRIVATE))
+
+	moments, has_more = {}, False
+	for queryset in sources:
+		page, next_cursor = paginate_moments(queryset.filter(deleted=False).only('id', 'created'), cursor, page_size)
+		moments.update((moment.pk, moment) for moment in page)
+		has_more = has_more or next_cursor is not None
+
+	moments = sorted(moments.values(), key=lambda moment: (moment.created, moment.pk), reverse=True)
+	has_more = has_more or len(moments) > page_size
+	moments = moments[:page_size]
+	return [moment.pk for moment in moments], encode_cursor(moments[-1]) if has_more and moments else None
@@ -1,3 +1,5 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, viewsets, status
 from rest_framework.response import Response
@@ -5,9 +7,10 @@ from rest_framework.response import Response
 from models import Moment, Post, Comment
 from serializers import MomentSerializer, PostSerializer, BasicPostSerializer
 
-from ..notifications.models import Notification
+from ..mixins import get_sparse_fieldset
+from ..notifications.dispatch import notify, notify_many
 
-from ..badges.script import trigger_action
+from ..badges.script import trigger_action, trigger_actions
 
 
 class MomentViewSet(viewsets.ViewSet):
@@ -17,8 +20,9 @@ class MomentViewSet(viewsets.ViewSet):
 	permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
 	def retrieve(self, request, pk):
-		moment = get_object_or_404(self.queryset, pk=pk)
-		serializer = MomentSerializer(moment)
+		sparse = get_sparse_fieldset(request)
+		moment = get_object_or_404(MomentSerializer.setup_eager_loading(self.queryset, **sparse), pk=pk)
+		serializer = MomentSerializer(moment, **sparse)
 		return Response(serializer.data)
 
 	def solve(self, request, pk):
@@ -27,12 +31,12 @@ class MomentViewSet(viewsets.ViewSet):
 		if moment.creator_id != request.user.pk:
 			return Response(status=status.HTTP_403_FORBIDDEN)
 		moment.solved = True
-		moment.save()
+		moment.save(update_fields=['solved', 'updated'])
 
-		for comment in moment.comments.all():
-			if moment.creator.id is not request.user.id:
-				trigger_action(comment.creator, 'answer_approved')
-				Notification.objects.create(receiver_id=comment.creator.id, content='approved your answer. EXP +15', sender_id=request.user.id)
+		# answers of other users, not the asker's own comments
+		approved = [comment for comment in moment.comments.select_related('creator') if comment.creator_id != request.user.id]
+		trigger_actions([(comment.creator, 'answer_approved') for comment in approved])
+		notify_many((comment.creator_id, request.user.id, 'approved your answer. EXP +15') for comment in approved)
 
 		return Response(status=status.HTTP_200_OK)
 
@@ -55,21 +59,32 @@ class MomentViewSet(viewsets.ViewSet):
 		moment.flagged_users.add(request.user)
 		if moment.flagged:
 			moment.deleted = True
-		moment.save()
+			moment.save(update_fields=['deleted', 'updated'])
 
 		trigger_action(request.user, 'report_classroom_moment')
 		return Response(status=status.HTTP_200_OK)
 
 	def like(self, request, pk):
 		moment = get_object_or_404(self.queryset, pk=pk)
-		if request.user not in moment.liked_users.all():
-			moment.liked_users.add(request.user)
-			moment.save()
-			if moment.creator_id is not request.user.id and request.user not in moment.liked_users.all():
-				Notification.objects.create(receiver_id=moment.creator_id, sender_id=request.user.id, content='liked your moment')
+		through = Moment.liked_users.through
+		liked = through.objects.filter(moment_id=moment.pk, account_id=request.user.pk)
+		if not liked.exists():
+			# only increment for the like row actually inserted, a concurrent like of the same user hits the unique constraint
+			try:
+				with transaction.atomic():
+					through.objects.create(moment_id=moment.pk, account_id=request.user.pk)
+			except IntegrityError:
+				pass
+			else:
+				Moment.objects.filter(pk=moment.pk).update(likes=F('likes') + 1)
+				if moment.creator_id != request.user.id:
+					notify(moment.creator_id, 'liked your moment', sender_id=request.user.id)
 		else:
-			moment.liked_users.filter(id = request.user.id).delete()
-		return Response({'likes': len(moment.liked_users.all())}, status=status.HTTP_200_OK)
+			# only decrement for the like row actually deleted, so concurrent unlikes can't go below zero
+			deleted, _ = liked.delete()
+			Moment.objects.filter(pk=moment.pk).update(likes=F('likes') - deleted)
+		moment.refresh_from_db(fields=['likes'])
+		return Response({'likes': moment.likes}, status=status.HTTP_200_OK)
 
 
 class PostViewSet(viewsets.ViewSet):
@@ -78,13 +93,15 @@ class PostViewSet(viewsets.ViewSet):
 	permission_classes = (permissions.IsAuthenticated,)
 
 	def retrieve(self, request, pk):
-		post = get_object_or_404(self.queryset, pk=pk)
-		serializer = PostSerializer(post)
+		sparse = get_sparse_fieldset(request)
+		post = get_object_or_404(PostSerializer.setup_eager_loading(self.queryset, **sparse), pk=pk)
+		serializer = PostSerializer(post, **sparse)
 		return Response(serializer.data)
 
 	def list(self, request):
-		posts = Post.objects.order_by('-created')
-		serializer = BasicPostSerializer(posts, many=True)
+		sparse = get_sparse_fieldset(request)
+		posts = BasicPostSerializer.setup_eager_loading(Post.objects.order_by('-created'), **sparse)
+		serializer = BasicPostSerializer(posts, many=True, **sparse)
 		return Response(serializer.data)
 
 	def create(self, request):
@@ -104,6 +121,7 @@ class PostViewSet(viewsets.ViewSet):
 		content = request.data.get('content', None)
 		if content:
 			Comment.objects.create(content=content, post_id=pk, creator=request.user)
+			Post.objects.filter(pk=pk).update(comments_count=F('comments_count') + 1)
 			trigger_action(request.user, 'post_forum')
 			return Response(status=status.HTTP_200_OK)
 		else:
@@ -117,7 +135,7 @@ class PostViewSet(viewsets.ViewSet):
 			if request.user not in post.down_voted_user.all() and request.user not in post.up_voted_user.all():
 				post.up_voted_user.add(request.user)
 				post.votes += 1
-				post.save()
+				post.save(update_fields=['votes', 'updated'])
 
 			return Response(status=status.HTTP_200_OK)
 		elif vote == -1:
@@ -126,7 +144,7 @@ class PostViewSet(viewsets.ViewSet):
 			if request.user not in post.down_voted_user.all() and request.user not in post.up_voted_user.all():
 				post.down_voted_user.add(request.user)
 				post.votes -= 1
-				post.save()
+				post.save(update_fields=['votes', 'updated'])
 
 			return Response(status=status.HTTP_200_OK)
 		else:
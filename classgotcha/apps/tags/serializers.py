@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from models import Tag
+from ..mixins import EagerLoadingMixin
 
 
-class ClassFolderSerializer(serializers.ModelSerializer):
+class ClassFolderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class Meta:
 		model = Tag
 		fields = ('name',)
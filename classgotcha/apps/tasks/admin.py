@@ -38,13 +38,13 @@ class TaskAdmin(admin.ModelAdmin):
 	fieldsets = (
 		('Task Info', {'fields': ('task_name', 'description', 'location', 'category', 'type')}),
 		('Time', {'fields': ('start', 'end',)}),
-		('Repeat', {'fields': ('repeat', 'repeat_start', 'repeat_end')}),
+		('Repeat', {'fields': ('repeat', 'weekdays', 'repeat_start', 'repeat_end')}),
 		('Involved', {'fields': ('involved', 'group')}),
 	)
 
 	inlines = [ClassroomInline]
 
-	readonly_fields = ('involved', 'classroom', 'group')
+	readonly_fields = ('involved', 'classroom', 'group', 'weekdays')
 
 	# Fix admin saving issue
 	# all classroom students and group members to the involved section
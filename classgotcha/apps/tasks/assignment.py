@@ -0,0 +1,45 @@
+from django.utils import timezone
+
+from models import Task
+from ..accounts.models import Group
+from ..classrooms.models import Classroom
+
+ASSIGN_BATCH_SIZE = 1000
+TaskInvolved = Task.involved.through
+
+
+def assign_task(task, account_ids):
+	"""
+	Add the accounts of an account id queryset to task.involved, returns the number of rows written.
+
+	Ids are streamed from the database and written ASSIGN_BATCH_SIZE rows per INSERT,
+	so no Account object of the roster is ever loaded. Accounts already involved are skipped.
+	"""
+	account_ids = account_ids.exclude(account_id__in=TaskInvolved.objects.filter(task_id=task.id).values('account_id'))
+	written, chunk = 0, []
+	for account_id in account_ids.iterator():
+		chunk.append(account_id)
+		if len(chunk) == ASSIGN_BATCH_SIZE:
+			written += write_chunk(task, chunk)
+			chunk = []
+	written += write_chunk(task, chunk)
+	if written:
+		# bulk_create skips m2m_changed and with it touch_calendar, instead of bumping the version
+		# of every calendar one UPDATE moves Task.updated, which is part of all their etags
+		Task.objects.filter(pk=task.id).update(updated=timezone.now())
+	return written
+
+
+def write_chunk(task, account_ids):
+	if not account_ids:
+		return 0
+	TaskInvolved.objects.bulk_create([TaskInvolved(task_id=task.id, account_id=account_id) for account_id in account_ids])
+	return len(account_ids)
+
+
+def assign_to_classroom(task, classroom_id):
+	return assign_task(task, Classroom.students.through.objects.filter(classroom_id=classroom_id).values_list('account_id', flat=True))
+
+
+def assign_to_group(task, group_id):
+	return assign_task(task, Group.members.through.objects.filter(group_id=group_id).values_list('account_id', flat=True))
@@ -0,0 +1,129 @@
+import calendar
+import hashlib
+import time
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from recurrence import MASK_WEEKDAYS, WEEKDAYS
+
+CALENDAR_VERSION_KEY = 'tasks:calendar_version:%d'
+CALENDAR_FEED_KEY = 'tasks:calendar_feed:%d:%s'
+CALENDAR_FEED_TIMEOUT = 60 * 60 * 24
+
+
+def touch_calendar(*account_ids):
+	"""Mark the calendars of the given accounts as changed, called when their task lists change."""
+	now = time.time()
+	cache.set_many(dict((CALENDAR_VERSION_KEY % pk, now) for pk in account_ids), None)
+
+
+def get_calendar_version(account_id):
+	key = CALENDAR_VERSION_KEY % account_id
+	version = cache.get(key)
+	if version is None:
+		# Unknown after a cache flush, start a new version so nothing stale is served
+		version = time.time()
+		cache.set(key, version, None)
+	return version
+
+
+def get_calendar_state(account):
+	"""
+	Return (etag, last_modified) of the account's calendar.
+
+	Combines the latest Task.updated of its tasks with the version bumped whenever
+	tasks are added to or removed from the account, so it costs a single aggregate.
+	"""
+	version = get_calendar_version(account.id)
+	latest = account.tasks.aggregate(latest=Max('updated'))['latest']
+	last_modified = max(version, calendar.timegm(latest.utctimetuple()) if latest else 0)
+	etag = hashlib.md5('%d:%r:%s' % (account.id, version, latest.isoformat() if latest else '')).hexdigest()
+	return etag, int(last_modified)
+
+
+def escape_text(value):
+	return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def get_repeat_range(task):
+	"""First and last day of a repeating task, from its own range or its classroom's semester."""
+	first, last = task.repeat_start, task.repeat_end
+	if first and last:
+		return first, last
+
+	semester = None
+	if task.category == task.CLASS and hasattr(task, 'classroom'):
+		semester = task.classroom.semester
+	elif task.category == task.OFFICE_HOUR:
+		office_hours = task.office_hour.all()
+		if office_hours:
+			semester = office_hours[0].classroom.semester
+
+	if semester:
+		first, last = first or semester.start, last or semester.end
+	return first, last
+
+
+def generate_vevent(task):
+	# if no start time is found, use -30 min in end time instead
+	start = task.start if task.start else task.end - timedelta(minutes=30)
+	end = task.end
+	weekdays = MASK_WEEKDAYS[task.weekdays]
+	rrule = None
+
+	if weekdays:
+		first, last = get_repeat_range(task)
+		if first:
+			# Class times only store a time of day, move them to the first matching day
+			day = next((first + timedelta(days=offset) for offset in range(7)
+			            if (first + timedelta(days=offset)).weekday() in weekdays), first)
+			start = datetime.combine(day, start.time())
+			end = datetime.combine(day, end.time())
+		rrule = 'RRULE:FREQ=WEEKLY;WKST=SU;BYDAY=%s' % ','.join(WEEKDAYS[weekday].upper() for weekday in weekdays)
+		if last:
+			rrule += ';UNTIL=%s' % datetime.combine(last, datetime.max.time()).strftime('%Y%m%dT%H%M%S')
+
+	lines = [
+		'BEGIN:VEVENT',
+		'UID:%d@classgotcha.com' % task.id,
+		'SUMMARY:%s' % escape_text(task.task_name),
+		'LOCATION:%s' % escape_text(task.location),
+		'DTSTART;TZID=America/New_York:%s' % start.strftime('%Y%m%dT%H%M%S'),
+		'DTEND;TZID=America/New_York:%s' % end.strftime('%Y%m%dT%H%M%S'),
+	]
+	if rrule:
+		lines.append(rrule)
+	lines += ['DESCRIPTION:%s' % escape_text(task.description), 'END:VEVENT']
+	return '\r\n'.join(lines) + '\r\n'
+
+
+def generate_calendar(account, token):
+	"""Yield the account's calendar one VEVENT at a time."""
+	yield 'BEGIN:VCALENDAR\r\nPRODID:-//classgotcha.com//%s//EN\r\nVERSION:2.0\r\n' % token
+	tasks = account.tasks.filter(end__isnull=False) \
+		.select_related('classroom__semester') \
+		.prefetch_related('office_hour__classroom__semester')
+	for task in tasks:
+		yield generate_vevent(task)
+	yield 'END:VCALENDAR\r\n'
+
+
+def stream_calendar(account, token, etag):
+	"""
+	Yield the rendered calendar, from the feed cache when this version was rendered before.
+
+	The cache key contains the etag, so a changed task list never hits an old entry.
+	"""
+	key = CALENDAR_FEED_KEY % (account.id, etag)
+	rendered = cache.get(key)
+	if rendered is not None:
+		yield rendered
+		return
+
+	chunks = []
+	for chunk in generate_calendar(account, token):
+		chunks.append(chunk)
+		yield chunk
+	cache.set(key, ''.join(chunks), CALENDAR_FEED_TIMEOUT)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Task
+from ...recurrence import weekday_mask
+
+
+class Command(BaseCommand):
+	help = 'Fill Task.weekdays from the repeat strings, safe to rerun'
+
+	def handle(self, *args, **options):
+		# There are only a few distinct repeat strings, one UPDATE each
+		updated = 0
+		for repeat in Task.objects.order_by().values_list('repeat', flat=True).distinct():
+			mask = weekday_mask(repeat)
+			updated += Task.objects.filter(repeat=repeat).exclude(weekdays=mask).update(weekdays=mask)
+		self.stdout.write('Updated weekdays of %d tasks' % updated)
@@ -0,0 +1,58 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ...assignment import assign_to_classroom
+from ...models import Task
+from ....accounts.models import Account
+from ....classrooms.models import Classroom, Major, Semester
+
+
+class Rollback(Exception):
+	pass
+
+
+class Command(BaseCommand):
+	help = 'Compare set-based classroom task assignment with involved.add(*students.all()), all changes are rolled back'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--students', type=int, default=2000, help='Roster size of the benchmark classroom')
+		parser.add_argument('--tasks', type=int, default=5, help='Tasks assigned per method')
+
+	def run(self, label, assign, classroom, tasks):
+		elapsed, queries = 0, 0
+		for i in range(tasks):
+			task = Task.objects.create(task_name='benchmark %d' % i, category=Task.HOMEWORK, task_of_classroom=classroom)
+			reset_queries()
+			with CaptureQueriesContext(connection) as captured:
+				started = time.time()
+				assign(task, classroom)
+				elapsed += time.time() - started
+			queries += len(captured)
+			assert task.involved.count() == classroom.students_count
+		self.stdout.write('%-28s %8.1f ms/task %8.1f queries/task' % (label, elapsed * 1000 / tasks, queries / float(tasks)))
+
+	def handle(self, *args, **options):
+		prefix = 'benchmark-%s' % uuid.uuid4().hex[:8]
+		try:
+			with transaction.atomic():
+				Account.objects.bulk_create([Account(email='%s-%d@example.com' % (prefix, i), first_name='Benchmark', last_name=str(i))
+				                             for i in range(options['students'])])
+				classroom = Classroom.objects.create(class_name=prefix, class_number='000', class_code=prefix[-10:], class_section='001',
+				                                     class_location='', major=Major.objects.create(major_short=prefix[-10:]),
+				                                     semester=Semester.objects.create(name=prefix[:20]), students_count=options['students'])
+				classroom.students.through.objects.bulk_create([
+					classroom.students.through(classroom_id=classroom.id, account_id=pk)
+					for pk in Account.objects.filter(email__startswith=prefix + '-').values_list('id', flat=True)])
+				self.stdout.write('%d students, %d tasks per method' % (options['students'], options['tasks']))
+
+				self.run('involved.add(*students)', lambda task, classroom: task.involved.add(*classroom.students.all()),
+				         classroom, options['tasks'])
+				self.run('set-based assign_task', lambda task, classroom: assign_to_classroom(task, classroom.id),
+				         classroom, options['tasks'])
+				raise Rollback
+		except Rollback:
+			pass
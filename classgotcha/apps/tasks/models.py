@@ -1,9 +1,13 @@
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.db import models
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
 
 from ..accounts.models import Account, Group
 from ..classrooms.models import Classroom
+from ical import touch_calendar
+from recurrence import MASK_WEEKDAYS, weekday_mask
 
 
 class Task(models.Model):
@@ -40,6 +44,7 @@ class Task(models.Model):
 	repeat = models.CharField(max_length=20, default='', blank=True,)  # MoTuWeThFiSaSu
 	repeat_start = models.DateField(null=True, blank=True,)
 	repeat_end = models.DateField(null=True, blank=True,)
+	weekdays = models.PositiveSmallIntegerField(default=0)  # bitmask of repeat, bit 0 is Monday
 
 	# Relationship
 	belongs_to = models.ForeignKey('self', related_name='preparations', null=True, blank=True)
@@ -49,12 +54,23 @@ class Task(models.Model):
 	task_of_classroom = models.ForeignKey(Classroom, related_name='tasks', on_delete=models.CASCADE, null=True)
 	creator = models.ForeignKey(Account, null=True)
 
+	# Timestamp
+	updated = models.DateTimeField(auto_now=True)
+
 	# Relation
 	# classroom
 
 	def __unicode__(self):
 		return self.task_name
 
+	def save(self, *args, **kwargs):
+		# weekdays mirrors repeat, so readers never parse the string
+		self.weekdays = weekday_mask(self.repeat)
+		update_fields = kwargs.get('update_fields')
+		if update_fields is not None and 'repeat' in update_fields and 'weekdays' not in update_fields:
+			kwargs['update_fields'] = list(update_fields) + ['weekdays']
+		super(Task, self).save(*args, **kwargs)
+
 	@property
 	def expired(self):
 		# TODO: FIXME! delete this in production env!!!!!!
@@ -91,4 +107,18 @@ class Task(models.Model):
 
 	@property
 	def repeat_list(self):
-		return [{'Mo':1, 'Tu':2, 'We':3, 'Th':4, 'Fr':5, 'Sa':6, 'Su':7}[x] for x in [self.repeat[i:i+2] for i in range(0, len(self.repeat), 2)]]
+		return [weekday + 1 for weekday in MASK_WEEKDAYS[self.weekdays]]
+
+
+@receiver(m2m_changed, sender=Task.involved.through)
+def task_involved_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	# Adding or removing tasks doesn't touch Task.updated, bump the calendar version instead
+	if action in ('post_add', 'post_remove'):
+		touch_calendar(*([instance.id] if reverse else pk_set))
+	elif action == 'pre_clear':
+		touch_calendar(*([instance.id] if reverse else instance.involved.values_list('id', flat=True)))
+
+
+@receiver(pre_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+	touch_calendar(*instance.involved.values_list('id', flat=True))
@@ -0,0 +1,38 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+WEEKDAYS = ('Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su')
+
+
+def weekday_mask(repeat):
+	"""Bitmask of a repeat string like 'MoWeFr', bit 0 is Monday as in date.weekday()."""
+	mask = 0
+	for i in range(0, len(repeat or ''), 2):
+		if repeat[i:i + 2] in WEEKDAYS:
+			mask |= 1 << WEEKDAYS.index(repeat[i:i + 2])
+	return mask
+
+
+# Weekday numbers of every possible mask, so expanding a task never loops over bits
+MASK_WEEKDAYS = [[weekday for weekday in range(7) if mask & 1 << weekday] for mask in range(1 << 7)]
+
+
+def expand(tasks, first_day, last_day):
+	"""
+	Yield (task, day) for every day between first_day and last_day a repeating task falls on.
+
+	The days of the range are bucketed by weekday once for the whole batch, every task
+	then takes a slice of the buckets of its weekdays bounded by its repeat range.
+	"""
+	days = [[] for _ in range(7)]
+	day = first_day
+	while day <= last_day:
+		days[day.weekday()].append(day)
+		day += timedelta(days=1)
+
+	for task in tasks:
+		first, last = task.repeat_start or first_day, task.repeat_end or last_day
+		for weekday in MASK_WEEKDAYS[task.weekdays]:
+			bucket = days[weekday]
+			for day in bucket[bisect_left(bucket, first):bisect_right(bucket, last)]:
+				yield task, day
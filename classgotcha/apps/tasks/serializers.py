@@ -1,17 +1,20 @@
 from models import Task, Account
+from assignment import assign_to_classroom, assign_to_group
 from rest_framework import serializers
 from ..classrooms.models import Classroom
+from ..mixins import EagerLoadingMixin
 
 
-class TaskClassroomSerializer(serializers.ModelSerializer):
+class TaskClassroomSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	class_short = serializers.ReadOnlyField()
+	select_related_fields = ('major',)
 
 	class Meta:
 		model = Classroom
 		fields = ('id', 'class_short',)
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	formatted_start_time = serializers.ReadOnlyField()
 	formatted_end_time = serializers.ReadOnlyField()
 	formatted_start_datetime = serializers.ReadOnlyField()
@@ -21,13 +24,14 @@ class TaskSerializer(serializers.ModelSerializer):
 	repeat_list = serializers.ReadOnlyField()
 	classroom = TaskClassroomSerializer(required=False)
 	task_of_classroom = TaskClassroomSerializer(required=False)  # Classroom task
+	prefetch_related_fields = ('involved', 'finished')
 
 	class Meta:
 		model = Task
 		fields = '__all__'
 
 
-class BasicTaskSerializer(serializers.ModelSerializer):
+class BasicTaskSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	formatted_start_time = serializers.ReadOnlyField()
 	formatted_end_time = serializers.ReadOnlyField()
 	formatted_start_date = serializers.ReadOnlyField()
@@ -62,7 +66,7 @@ class BasicTaskSerializer(serializers.ModelSerializer):
 		          'expired')
 
 
-class ClassTimeTaskSerializer(serializers.ModelSerializer):
+class ClassTimeTaskSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 	'''
 	The serializer for showing class schedule
 	'''
@@ -101,11 +105,11 @@ class CreateTaskSerializer(serializers.ModelSerializer):
 
 		task = Task.objects.create(**validated_data)
 
-		# TODO: Task add to all classroom users immediately
+		# the whole roster is assigned from the join table ids, without loading the accounts
 		if task.task_of_classroom_id:
-			task.involved.add(*task.task_of_classroom.students.all())
+			assign_to_classroom(task, task.task_of_classroom_id)
 
-		elif task.group:
-			task.involved.add(*task.group.members.all())
+		elif task.group_id:
+			assign_to_group(task, task.group_id)
 
 		return task
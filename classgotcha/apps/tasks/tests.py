@@ -0,0 +1,45 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from models import Task
+from serializers import BasicTaskSerializer
+from ..accounts.models import Account
+from ..classrooms.models import Classroom, Major, Semester
+from ..classrooms.serializers import ClassroomSerializer
+
+
+class SparseTasksTest(TestCase):
+	def setUp(self):
+		class_time = Task.objects.create(task_name='class', category=Task.CLASS, repeat='MoWeFr')
+		self.classroom = Classroom.objects.create(class_name='Intro', class_number='121', class_code='10001', class_section='001',
+		                                          class_location='', class_time=class_time, major=Major.objects.create(major_short='CMPSC'),
+		                                          semester=Semester.objects.create(name='Fall 2017'))
+		for i in range(3):
+			Task.objects.create(task_name='homework %d' % i, category=Task.HOMEWORK, task_of_classroom=self.classroom)
+		self.client = APIClient()
+		self.client.force_authenticate(Account.objects.create(email='me@psu.edu'))
+
+	def test_task_plan_drops_classroom_joins(self):
+		select_related, prefetch_related = BasicTaskSerializer.get_eager_loading_lookups()
+		self.assertEqual(set(select_related), {'classroom', 'classroom__major', 'task_of_classroom', 'task_of_classroom__major'})
+		self.assertEqual(BasicTaskSerializer.get_eager_loading_lookups(fields='id,task_name,end'), ([], []))
+		select_related, prefetch_related = BasicTaskSerializer.get_eager_loading_lookups(fields='id,task_of_classroom.class_short')
+		self.assertEqual(set(select_related), {'task_of_classroom', 'task_of_classroom__major'})
+
+	def test_classroom_plan_drops_class_time_join(self):
+		select_related, prefetch_related = ClassroomSerializer.get_eager_loading_lookups()
+		self.assertIn('class_time', select_related)
+		select_related, prefetch_related = ClassroomSerializer.get_eager_loading_lookups(fields='id,class_name')
+		self.assertNotIn('class_time', select_related)
+
+	def test_classroom_tasks_fields(self):
+		# the classroom and the tasks, without joining their classrooms
+		with self.assertNumQueries(2):
+			response = self.client.get('/classroom/%d/tasks/?fields=id,task_name' % self.classroom.id)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([sorted(task) for task in response.data], [['id', 'task_name']] * 3)
+
+	def test_classroom_tasks_default(self):
+		response = self.client.get('/classroom/%d/tasks/' % self.classroom.id)
+		self.assertEqual(response.data[0]['task_of_classroom'], {'id': self.classroom.id, 'class_short': 'CMPSC 121'})
+		self.assertIn('repeat_list', response.data[0])
@@ -0,0 +1,207 @@
+import unicodedata
+import uuid
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Max
+
+TYPEAHEAD_LIMIT = 10
+# Catching up re-reads rows updated this long before the last one indexed, for transactions that committed late
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def normalize(text):
+	"""Lower case, accents stripped and whitespace collapsed, as utf-8 bytes, which sort and prefix like the text."""
+	if isinstance(text, str):
+		text = text.decode('utf-8', 'ignore')
+	text = text or u''
+	try:
+		# most names are plain ascii, which needs no decomposition
+		return ' '.join(text.encode('ascii').lower().split())
+	except UnicodeEncodeError:
+		pass
+	text = unicodedata.normalize('NFKD', text)
+	text = u''.join(c for c in text if not unicodedata.combining(c))
+	return u' '.join(text.lower().split()).encode('utf-8')
+
+
+def hydrate(queryset, ids):
+	"""Objects of the ids in their order, with a single in_bulk query, rows deleted since they were indexed are dropped."""
+	objects = queryset.in_bulk(ids) if ids else {}
+	return [objects[pk] for pk in ids if pk in objects]
+
+
+class PrefixIndex(object):
+	"""
+	Normalized keys of a model kept sorted in two parallel lists, keys and ids.
+
+	Every key starting with a prefix is in one run of the sorted list, found with a
+	single bisect, so a lookup costs O(log n + limit) whatever the number of rows.
+	"""
+
+	def __init__(self):
+		self.keys = []
+		self.ids = []
+		self.documents = {}
+		# Latest updated timestamp of the rows read and the shared version the index is current with
+		self.synced = None
+		self.version = None
+
+	def fill(self, rows):
+		"""Index (id, keys) rows at once, one sort instead of an insertion per key."""
+		entries = []
+		for pk, keys in rows:
+			keys = sorted(set(key for key in keys if key))
+			self.documents[pk] = keys
+			entries.extend((key, pk) for key in keys)
+		entries.sort()
+		self.keys = [key for key, pk in entries]
+		self.ids = [pk for key, pk in entries]
+
+	def add(self, pk, keys):
+		"""Index or re-index a row, returns whether its keys changed."""
+		keys = sorted(set(key for key in keys if key))
+		if self.documents.get(pk) == keys:
+			return False
+		self.remove(pk)
+		self.documents[pk] = keys
+		for key in keys:
+			# rows sharing a key stay in id order, as fill() leaves them
+			i = bisect_left(self.keys, key)
+			while i < len(self.keys) and self.keys[i] == key and self.ids[i] < pk:
+				i += 1
+			self.keys.insert(i, key)
+			self.ids.insert(i, pk)
+		return True
+
+	def remove(self, pk):
+		keys = self.documents.pop(pk, None)
+		for key in keys or ():
+			i = bisect_left(self.keys, key)
+			while self.ids[i] != pk:
+				i += 1
+			del self.keys[i]
+			del self.ids[i]
+		return keys is not None
+
+	def lookup(self, prefix, limit=TYPEAHEAD_LIMIT):
+		"""Ids of the first rows with a key starting with the prefix, shortest and alphabetically first keys first."""
+		found = []
+		if not prefix:
+			return found
+		i = bisect_left(self.keys, prefix)
+		while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(prefix):
+			if self.ids[i] not in found:
+				found.append(self.ids[i])
+			i += 1
+		return found
+
+
+class Typeahead(object):
+	"""
+	Prefix index of one model held in every process.
+
+	The index is built on first use with one values_list query. Saves update it in the
+	process that made them and move the shared cache version, the other processes then
+	catch up on the rows whose updated timestamp moved. Deleted rows drop out when the
+	ids are hydrated.
+	"""
+	name = None
+	fields = ()
+
+	def __init__(self):
+		self.version_key = 'typeahead:%s:version' % self.name
+		self.index = None
+
+	def get_queryset(self):
+		raise NotImplementedError
+
+	def get_keys(self, values):
+		raise NotImplementedError
+
+	def rows(self, queryset):
+		for row in queryset.values_list('id', *self.fields).iterator():
+			yield row[0], self.get_keys(row[1:])
+
+	def latest(self):
+		# read before the rows, anything saved meanwhile is read again on the next catch up
+		return self.get_queryset().aggregate(latest=Max('updated'))['latest']
+
+	def get_version(self):
+		version = cache.get(self.version_key)
+		if version is None:
+			# add() so that processes racing after a cache flush settle on one version
+			cache.add(self.version_key, uuid.uuid4().hex, None)
+			version = cache.get(self.version_key)
+		return version
+
+	def get_index(self):
+		version = self.get_version()
+		if self.index is None:
+			index = PrefixIndex()
+			index.synced = self.latest()
+			index.fill(self.rows(self.get_queryset()))
+			self.index = index
+		elif self.index.version != version:
+			queryset = self.get_queryset()
+			if self.index.synced:
+				queryset = queryset.filter(updated__gte=self.index.synced - SYNC_OVERLAP)
+			self.index.synced = self.latest() or self.index.synced
+			for pk, keys in self.rows(queryset):
+				self.index.add(pk, keys)
+		self.index.version = version
+		return self.index
+
+	def lookup(self, query, limit=TYPEAHEAD_LIMIT):
+		return self.get_index().lookup(normalize(query), limit)
+
+	def update(self, ids):
+		"""Re-index saved or deleted rows, called on commit."""
+		changed = self.index is None
+		if self.index is not None:
+			found = set()
+			for pk, keys in self.rows(self.get_queryset().filter(pk__in=ids)):
+				changed |= self.index.add(pk, keys)
+				found.add(pk)
+			for pk in set(ids) - found:
+				changed |= self.index.remove(pk)
+		# a process without an index can't tell whether the keys changed, the others check on their next lookup
+		if changed:
+			version = uuid.uuid4().hex
+			cache.set(self.version_key, version, None)
+			if self.index is not None:
+				self.index.version = version
+
+
+class AccountTypeahead(Typeahead):
+	"""Accounts by 'first last', last name and email."""
+	name = 'accounts'
+	fields = ('first_name', 'last_name', 'email')
+
+	def get_queryset(self):
+		from accounts.models import Account
+		return Account.objects.order_by()
+
+	def get_keys(self, values):
+		first_name, last_name, email = values
+		return normalize(u'%s %s' % (first_name, last_name)), normalize(last_name), normalize(email)
+
+
+class ClassroomTypeahead(Typeahead):
+	"""Classrooms by class short ('cmpsc 121' and 'cmpsc121'), code and name."""
+	name = 'classrooms'
+	fields = ('major__major_short', 'class_number', 'class_code', 'class_name')
+
+	def get_queryset(self):
+		from classrooms.models import Classroom
+		return Classroom.objects.order_by()
+
+	def get_keys(self, values):
+		major_short, class_number, class_code, class_name = values
+		class_short = normalize(u'%s %s' % (major_short, class_number))
+		return class_short, class_short.replace(' ', ''), normalize(class_code), normalize(class_name)
+
+
+account_typeahead = AccountTypeahead()
+classroom_typeahead = ClassroomTypeahead()
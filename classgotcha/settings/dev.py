@@ -12,6 +12,9 @@ MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
 
 SECRET = '42'
 
+# Apply badge events inside the request, no process_badge_events needed
+BADGE_EVENTS_ASYNC = False
+
 # ------ Database ------
 DATABASES = {
 	'default': {
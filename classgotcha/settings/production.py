@@ -72,6 +72,7 @@ MIDDLEWARE = [
 	'django.contrib.auth.middleware.AuthenticationMiddleware',
 	'django.contrib.messages.middleware.MessageMiddleware',
 	'django.middleware.clickjacking.XFrameOptionsMiddleware',
+	'classgotcha.apps.notifications.middleware.NotificationBatchMiddleware',
 	# 'classgotcha.middleware.MyMiddleware',
 	# --- account support ---
 	# 'account.middleware.LocaleMiddleware',
@@ -139,6 +140,20 @@ DATABASES = {
 
 }
 
+# ------ Cache ------
+# Shared by the web and worker processes, which keep versions (calendars, badge rules, search
+# and typeahead indexes, rosters) and unread counters in it without expiry. Redis never culls
+# them and increments atomically, the channel layer above uses database 0, the cache database 1.
+CACHES = {
+	'default': {
+		'BACKEND' : 'django_redis.cache.RedisCache',
+		'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
+		'OPTIONS' : {
+			'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+		},
+	}
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # ------ Password validation ------
@@ -258,5 +273,17 @@ AWS_SES_REGION_NAME = 'us-east-1'
 AWS_SES_REGION_ENDPOINT = 'email.us-east-1.amazonaws.com'
 AWS_SES_AUTO_THROTTLE = 0.5  # (default; safety factor applied to rate limit)
 
+# ------------BADGES--------------
+# trigger_action only queues events, run `manage.py process_badge_events` to apply them
+BADGE_EVENTS_ASYNC = True
+
+# ------------CLASSROOM SEARCH--------------
+# The default backend keeps an inverted index in every process, starting from this snapshot.
+# `manage.py rebuild_search_index` rewrites it (or the Solr core of SolrSearchBackend)
+CLASSROOM_SEARCH_BACKEND = 'classgotcha.apps.classrooms.search.LocalSearchBackend'
+CLASSROOM_SEARCH_INDEX_PATH = os.path.join(PROJECT_ROOT, 'local/tmp/classroom_search.index')
+# CLASSROOM_SEARCH_BACKEND = 'classgotcha.apps.classrooms.search.SolrSearchBackend'
+# CLASSROOM_SEARCH_SOLR_URL = 'http://localhost:8983/solr/classrooms'
+
 # ------------MATRIX CONFIGURATION--------------
 MATRIX_HOST = 'http://matrix.classgotcha.com:8008'
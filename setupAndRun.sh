@@ -7,5 +7,6 @@ rm -rf *.pyc
 
 python manage.py makemigrations
 python manage.py migrate
+python manage.py backfill_task_weekdays
 
 python manage.py runserver